@@ -28,6 +28,8 @@ setup(
         'tensorbuilder.api',
         'tensorbuilder.extensions',
         'tensorbuilder.extensions.patches',
+        'tensorbuilder.extensions.functions',
+        'tensorbuilder.benchmarks',
         'tensorbuilder.tests'
     ],
     package_data={
@@ -17,7 +17,7 @@ import tensordata
 import extensions
 import api
 
-tb = api.API(lambda x: x)
+tb = api.API(core.dsl.Program(()))
 
 #pdoc
 __all__ = ["core", "tensordata", "extensions", "api"]
@@ -2,21 +2,25 @@ import builder
 import builder_tree
 import applicative
 from tensorbuilder import tensordata
+from tensorbuilder import core
 
 class API(applicative.Applicative):
     """
     This class represents the public API of TensorBuilder that is created as a class and given to the user as the instance object `tb`. This is done because modules cannot define `__call__` and being function is important for the DSL. `tb` is actually an Applicative that contains the identity function, therefore you can use `tb` as an element inside and expression whenever you need to just return the argument. This is useful because in some cases you create branches in which one just contains the argument unmodified.
     """
+    __slots__ = ()
+
     def __init__(self, f):
         super(API, self).__init__(f)
 
-    def build(self, tensor):
+    def build(self, tensor, lazy=False):
         """
         Takes a Tensor and returns a Builder that contians it.
 
         ** Parameters **
 
         * `tensor`: a tensorflow Tensor
+        * `lazy`: if `True` the Builder records a plan instead of creating ops, they are only created (after optimizing the plan) for the parts that are needed when `tensor()` or `tensors()` is called. See `tensorbuilder.core.plan`.
 
 
         #### Example
@@ -27,9 +31,124 @@ class API(applicative.Applicative):
 
             a = tf.placeholder(tf.float32, shape=[None, 8])
             a_builder = tb.build(a)
+
+        In lazy mode only the branches that are used create ops
+
+            h = tb.pipe(
+                tb.build(a, lazy=True),
+                [
+                    tb.relu_layer(10)
+                ,
+                    tb.sigmoid_layer(10)
+                ],
+                tb.builders()
+            )[0].tensor() # the sigmoid layer is never created
         """
+        if lazy:
+            tensor = core.plan.source(tensor)
+
         return self.Builder(tensor)
 
+    def cse(self, only=None):
+        """
+        Returns a context manager that enables common subexpression elimination of `tensorbuilder.core.builders.Builder.map` (and the methods built on it) while its active: identical calls with the same input Tensor, function and hashable arguments return the Tensor built by the first call instead of creating new ops. Calls that create variables, like layers, or stateful ops, like `tf.nn.dropout`, are never deduplicated and calls inside different scopes of the DSL don't share results. See `tensorbuilder.core.cse`.
+
+        ** Parameters **
+
+        * `only`: an optional iterable of functions, if given only calls to these functions are deduplicated.
+
+        ** Return **
+
+        A `tensorbuilder.core.cse.CSE` context manager, its `report()` method returns how many calls and ops were deduplicated.
+
+        #### Example
+
+            import tensorflow as tf
+            from tensorbuilder import tb
+
+            x = tf.placeholder(tf.float32, shape=[None, 28, 28, 1])
+
+            with tb.cse() as cse:
+                h = tb.pipe(
+                    x,
+                    [
+                        tb.flatten().relu_layer(10)
+                    ,
+                        tb.flatten().sigmoid_layer(10)
+                    ],
+                    tb.reduce(tf.add)
+                    .tensor()
+                )
+
+            cse.report()["deduplicated"] # 1, the second `flatten`
+        """
+        return core.cse.CSE(only=only)
+
+    def estimate(self, ast, input_shape, bytes_per_element=4):
+        """
+        Estimates the cost of applying the DSL expression `ast` to a Tensor of shape `input_shape` without creating any ops: the output shape, the number of parameters, the multiply-adds and the activation memory per example of each method call. Methods without a registered estimator are assumed to keep the shape and be free. See `tensorbuilder.core.cost`.
+
+        ** Parameters **
+
+        * `ast`: a DSL expression, see `tensorbuilder.core.applicative.ApplicativeBase.pipe`.
+        * `input_shape`: the shape of the input including the batch dimension, e.g. `[None, 784]`.
+        * `bytes_per_element`: size of an element of the activations, `4` for `tf.float32`.
+
+        ** Return **
+
+        A `tensorbuilder.core.cost.Estimate` with the totals `params`, `flops` and `activation_bytes`, the `output_shape`, the per call `nodes` and the `unknown` methods.
+
+        #### Example
+
+            from tensorbuilder import tb
+
+            estimate = tb.estimate(
+                (
+                    tb.relu_layer(100)
+                    .softmax_layer(10)
+                ),
+                [None, 784]
+            )
+
+            estimate.params # 79510
+            estimate.output_shape # (None, 10)
+        """
+        return core.cost.estimate(ast, input_shape, bytes_per_element=bytes_per_element)
+
+    def profile(self, verbose=True, stream=None, json_path=None, sort="time"):
+        """
+        Returns a context manager that profiles graph construction while its active: for every method generated by the `register_*` methods, `compose`, the compilation of the DSL and `BuilderTree.reduce` / `BuilderTree.map_each` it records the number of calls, the cumulative wall time and the number of ops created. A report sorted by `sort` is written to `stream` on exit if `verbose` is `True`. See `tensorbuilder.core.profiler`.
+
+        ** Parameters **
+
+        * `verbose`: whether to write the text report on exit. (default: `True`)
+        * `stream`: the file where the text report is written, `None` means `sys.stderr`.
+        * `json_path`: an optional path where a JSON version of the report is written on exit, e.g. for dashboards.
+        * `sort`: `"time"`, `"calls"`, `"ops"` or `"name"`. (default: `"time"`)
+
+        ** Return **
+
+        A `tensorbuilder.core.profiler.Profile`, its `report()` method returns the rows of the report as dicts.
+
+        #### Example
+
+            import tensorflow as tf
+            from tensorbuilder import tb
+
+            x = tf.placeholder(tf.float32, shape=[None, 5])
+
+            with tb.profile(json_path="profile.json") as profile:
+                h = tb.pipe(
+                    x,
+                    tb.relu_layer(10)
+                    .softmax_layer(3)
+                    .tensor()
+                )
+
+            profile.report()[0]["name"] # e.g. "Builder.relu_layer"
+        """
+        return core.profiler.Profile(verbose=verbose, stream=stream, json_path=json_path, sort=sort)
+
     def branches(self, builder_iterable):
         """
         Takes an iterable with elements of type `Builder` or `BuilderTree` and returns a `BuilderTree`
@@ -53,7 +172,7 @@ class API(applicative.Applicative):
         """
         return self.BuilderTree(builder_iterable)
 
-API.data = tensordata.data
+API.data = staticmethod(tensordata.data)
 
 API.Builder = builder.Builder
 API.BuilderTree = builder_tree.BuilderTree
@@ -0,0 +1,9 @@
+"""
+Benchmarks of TensorBuilder's graph construction overhead. Each module has a `run` function that returns its measurements and can be executed directly, e.g.
+
+    python -m tensorbuilder.benchmarks.immutable
+
+Running the package executes every suite and writes the results as JSON, see `tensorbuilder.benchmarks.__main__`.
+
+    python -m tensorbuilder.benchmarks -o results.json
+"""
@@ -0,0 +1,58 @@
+"""
+Runs the benchmark suites and writes their results as JSON together with the versions of TensorBuilder, TensorFlow and Python, so results of different releases can be compared.
+
+    python -m tensorbuilder.benchmarks                          # every suite, JSON to stdout
+    python -m tensorbuilder.benchmarks graph memory -o out.json # some suites, JSON to a file
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+import importlib
+import tensorflow as tf
+import tensorbuilder
+
+SUITES = ["graph", "data", "immutable", "memory", "fully_connected", "polynomic"]
+
+def run(suites=SUITES):
+    """
+    Runs the `run` function of each module in `suites` and returns a dict with the environment and the `results` of each suite.
+    """
+    results = {}
+
+    for suite in suites:
+        sys.stderr.write("running {0}...\n".format(suite))
+        start = time.time()
+        results[suite] = importlib.import_module("tensorbuilder.benchmarks." + suite).run()
+        sys.stderr.write("{0} done in {1:.1f}s\n".format(suite, time.time() - start))
+
+    return {
+        "tensorbuilder": tensorbuilder.__version__.strip(),
+        "tensorflow": tf.__version__,
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "results": results
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tensorbuilder.benchmarks", description="Runs TensorBuilder's benchmarks and writes the results as JSON.")
+    parser.add_argument("suites", nargs="*", help="suites to run, any of {0} (default: all)".format(", ".join(SUITES)))
+    parser.add_argument("-o", "--output", help="file where the JSON is written (default: stdout)")
+    args = parser.parse_args(argv)
+
+    for suite in args.suites:
+        if suite not in SUITES:
+            parser.error("unknown suite {0}".format(suite))
+
+    output = json.dumps(run(args.suites or SUITES), indent=2, sort_keys=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Throughput benchmark of `tensorbuilder.tensordata.Data` over synthetic `float32` sources `x` of shape `[rows, width]` and `y` of shape `[rows, 1]`. For each shape it measures:
+
+* `split`: `split(0.6, 0.2, 0.2)`, each split counts as a batch.
+* `split_view`: same as `split` with `view=True`.
+* `batch`: one pass over `batch(batch_size)`.
+* `epochs`: `batch(batch_size).epochs(epochs)`.
+* `shuffle`: `shuffle().batch(batch_size).epochs(epochs)`.
+* `shuffle_reuse`: `shuffle().batch(batch_size, reuse=True).epochs(epochs)`.
+* `map`: `batch(batch_size).map(fn, workers)` with `fn` applying `np.tanh` to `x` and `workers` the number of CPUs.
+* `run`: feeding the first `run_batches` batches to a session with `Data.run`.
+* `run_prefetch`: same as `run` with the batches prefetched by `prefetch(4)`.
+
+and reports `batches_per_sec`, `bytes_per_batch` (bytes of the batches that are copies instead of views of the sources) and `peak_mb` (the growth of the peak resident memory during the case). Every case runs in a fresh interpreter so the peak memory of one doesn't hide the next one.
+
+    python -m tensorbuilder.benchmarks.data
+"""
+
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import subprocess
+import multiprocessing
+import numpy as np
+from tensorbuilder.tensordata import Data
+
+SHAPES = [(100000, 10), (1000000, 10), (10000000, 10), (1000000, 1), (1000000, 100)]
+CASES = ["split", "split_view", "batch", "epochs", "shuffle", "shuffle_reuse", "map", "run", "run_prefetch"]
+
+def _sources(rows, width):
+    return dict(x=_random(rows, width), y=_random(rows, 1))
+
+def _random(rows, width, chunk=65536):
+    "Filled by chunks so a `float64` temporary doesn't raise the peak memory the cases are measured against"
+    array = np.empty((rows, width), dtype=np.float32)
+
+    for start in range(0, rows, chunk):
+        end = min(start + chunk, rows)
+        array[start:end] = np.random.rand(end - start, width)
+
+    return array
+
+def _copied(data, sources):
+    "Bytes of the arrays of `data` that don't share memory with `sources`, for index views the bytes of the indexes"
+    indexes = getattr(data, "indexes", None)
+    arrays = data._sources if isinstance(data, Data) else data.sources
+
+    return (indexes.nbytes if indexes is not None else 0) + sum( arrays[k].nbytes for k in sources if not np.may_share_memory(arrays[k], sources[k]) )
+
+def _tanh(sources):
+    return dict(sources, x=np.tanh(sources["x"]))
+
+def _iterate(batches, sources, limit=None, each=None):
+    count = 0
+    copied = 0
+
+    for data in batches:
+        copied += _copied(data, sources)
+        count += 1
+
+        if each is not None:
+            each(data)
+
+        if limit is not None and count >= limit:
+            break
+
+    return count, copied
+
+def _case(case, rows, width, batch_size, epochs, run_batches):
+    from tensorbuilder import tb
+
+    sources = _sources(rows, width)
+    data = tb.data(**sources)
+    each = None
+
+    if case in ("run", "run_prefetch"):
+        import tensorflow as tf
+
+        x = tf.placeholder(tf.float32, shape=[None, width])
+        y = tf.placeholder(tf.float32, shape=[None, 1])
+        total = tf.reduce_sum(x) + tf.reduce_sum(y)
+        sess = tf.Session(config=tf.ConfigProto(device_count={"GPU": 0}))
+        each = lambda batch: batch.run(sess, total, x=x, y=y)
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+
+    if case in ("split", "split_view"):
+        splits = data.split(0.6, 0.2, 0.2, view=case == "split_view")
+        count, copied = len(splits), sum( _copied(split, sources) for split in splits )
+
+    elif case == "batch":
+        count, copied = _iterate(data.batch(batch_size), sources)
+
+    elif case == "epochs":
+        count, copied = _iterate(data.batch(batch_size).epochs(epochs), sources)
+
+    elif case in ("shuffle", "shuffle_reuse"):
+        count, copied = _iterate(data.shuffle().batch(batch_size, reuse=case == "shuffle_reuse").epochs(epochs), sources)
+
+    elif case == "map":
+        count, copied = _iterate(data.batch(batch_size).map(_tanh, workers=multiprocessing.cpu_count()), sources)
+
+    elif case == "run":
+        count, copied = _iterate(data.batch(batch_size), sources, limit=run_batches, each=each)
+
+    else: #run_prefetch
+        count, copied = _iterate(data.batch(batch_size).prefetch(4), sources, limit=run_batches, each=each)
+
+    seconds = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+
+    return {
+        "batches": count,
+        "seconds": seconds,
+        "batches_per_sec": count / seconds if seconds > 0 else float("inf"),
+        "bytes_per_batch": copied // max(count, 1),
+        "peak_mb": peak / 1024.0 # ru_maxrss is in KB on Linux
+    }
+
+def _isolated(case, rows, width, batch_size, epochs, run_batches):
+    "Runs `_case` in a new interpreter"
+    cwd = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    args = [sys.executable, "-m", "tensorbuilder.benchmarks.data", "--case", case] + [ str(arg) for arg in (rows, width, batch_size, epochs, run_batches) ]
+
+    with open(os.devnull, "w") as devnull:
+        output = subprocess.check_output(args, cwd=cwd, stderr=devnull)
+
+    return json.loads(output.strip().splitlines()[-1])
+
+def run(shapes=SHAPES, cases=CASES, batch_size=128, epochs=2, run_batches=1000):
+    """
+    Returns a dict `{"<rows>x<width>": {case: {"batches", "seconds", "batches_per_sec", "bytes_per_batch", "peak_mb"}}}`.
+    """
+    return {
+        "{0}x{1}".format(rows, width): {
+            case: _isolated(case, rows, width, batch_size, epochs, run_batches)
+            for case in cases
+        }
+        for rows, width in shapes
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tensorbuilder.benchmarks.data")
+    parser.add_argument("--case", nargs=6, metavar=("CASE", "ROWS", "WIDTH", "BATCH_SIZE", "EPOCHS", "RUN_BATCHES"), help="runs a single case and prints its result as JSON")
+    args = parser.parse_args(argv)
+
+    if args.case:
+        case, numbers = args.case[0], [ int(arg) for arg in args.case[1:] ]
+        print(json.dumps(_case(case, *numbers)))
+        return
+
+    results = run()
+
+    print("{0:<16}{1:<14}{2:>14}{3:>18}{4:>12}".format("shape", "case", "batches/s", "bytes/batch", "peak MB"))
+
+    for shape in sorted(results, key=lambda shape: [ int(n) for n in shape.split("x") ]):
+        for case in CASES:
+            result = results[shape][case]
+            print("{0:<16}{1:<14}{2:>14.1f}{3:>18}{4:>12.1f}".format(shape, case, result["batches_per_sec"], result["bytes_per_batch"], result["peak_mb"]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmarks of graph construction. Each case reports the best wall time in milliseconds of a few repetitions:
+
+* `import`: `import tensorbuilder` in a fresh interpreter, on top of importing tensorflow.
+* `patch_lazy`, `patch_eager`: creating the patched Builder, BuilderTree and Applicative classes.
+* `fluent_chain`: `Builder.relu_layer` chained `layers` times.
+* `pipe_sequence`: `tb.pipe` of a sequence of `depth` elements.
+* `pipe_branches`: `tb.pipe` of a branching of `width` layers followed by `reduce(tf.add)`.
+* `tree_iteration`: iterating a BuilderTree of `leaves` leaves.
+* `compile_repeated`: `tb.compile` of the same sequence of `depth` elements, `calls` times.
+
+    python -m tensorbuilder.benchmarks.graph
+"""
+
+import os
+import sys
+import time
+import subprocess
+import tensorflow as tf
+import tensorbuilder
+from tensorbuilder import tb
+from tensorbuilder import extensions
+
+_import_code = """
+import time
+import tensorflow
+start = time.time()
+import tensorbuilder
+print(time.time() - start)
+"""
+
+def _best(f, repeat):
+    "Best wall time of `repeat` calls of `f` in milliseconds, `f` returns a function that is timed so it can do its setup first"
+    times = []
+
+    for _ in range(repeat):
+        timed = f()
+        start = time.time()
+        timed()
+        times.append(time.time() - start)
+
+    return min(times) * 1000
+
+def _in_graph(f):
+    "Returns a setup function that creates a placeholder in a new graph and returns a function that calls `f` on it inside that graph"
+    def _setup():
+        graph = tf.Graph()
+
+        with graph.as_default():
+            x = tf.placeholder(tf.float32, shape=[None, 8])
+
+        def _timed():
+            with graph.as_default():
+                f(x)
+
+        return _timed
+
+    return _setup
+
+def import_time(repeat=3):
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(tensorbuilder.__file__)))
+    runs = [ float(subprocess.check_output([sys.executable, "-c", _import_code], cwd=cwd).strip().splitlines()[-1]) for _ in range(repeat) ]
+    return min(runs) * 1000
+
+def patch_time(eager, repeat=3):
+    return _best(lambda: lambda: extensions.patched_tensorbuilder_classes(eager=eager, use_manifest=False), repeat)
+
+def fluent_chain(layers, repeat=3):
+    def _chain(x):
+        builder = tb.build(x)
+
+        for _ in range(layers):
+            builder = builder.relu_layer(8)
+
+        return builder.tensor()
+
+    return _best(_in_graph(_chain), repeat)
+
+def pipe_sequence(depth, repeat=3):
+    ast = tuple( tb.relu() for _ in range(depth) )
+    return _best(_in_graph(lambda x: tb.pipe(x, ast, tb.tensor())), repeat)
+
+def pipe_branches(width, repeat=3):
+    ast = [ tb.relu_layer(8) for _ in range(width) ]
+    return _best(_in_graph(lambda x: tb.pipe(x, ast, tb.reduce(tf.add).tensor())), repeat)
+
+def tree_iteration(leaves, repeat=3):
+    tree = tb.BuilderTree([ tb.Builder(i) for i in range(leaves) ])
+    return _best(lambda: lambda: list(tree), repeat)
+
+def compile_repeated(depth, calls, repeat=3):
+    ast = tuple( tb.relu() for _ in range(depth) )
+
+    def _compile():
+        for _ in range(calls):
+            tb.compile(ast)
+
+    return _best(lambda: _compile, repeat)
+
+def run(layers=50, depth=500, width=100, leaves=10000, calls=1000, repeat=3):
+    """
+    Returns a dict `{case: {"ms": milliseconds, "size": size of the case}}`, see `tensorbuilder.benchmarks.graph` for the cases.
+    """
+    return {
+        "import": { "ms": import_time(repeat), "size": 1 },
+        "patch_lazy": { "ms": patch_time(False, repeat), "size": 1 },
+        "patch_eager": { "ms": patch_time(True, repeat), "size": 1 },
+        "fluent_chain": { "ms": fluent_chain(layers, repeat), "size": layers },
+        "pipe_sequence": { "ms": pipe_sequence(depth, repeat), "size": depth },
+        "pipe_branches": { "ms": pipe_branches(width, repeat), "size": width },
+        "tree_iteration": { "ms": tree_iteration(leaves, repeat), "size": leaves },
+        "compile_repeated": { "ms": compile_repeated(depth, calls, repeat), "size": calls }
+    }
+
+def main():
+    results = run()
+
+    print("{0:<20}{1:>10}{2:>14}".format("case", "size", "ms"))
+
+    for name in sorted(results):
+        print("{0:<20}{1:>10}{2:>14.3f}".format(name, results[name]["size"], results[name]["ms"]))
+
+if __name__ == '__main__':
+    main()
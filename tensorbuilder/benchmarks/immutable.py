@@ -0,0 +1,64 @@
+"""
+Micro-benchmark of the per-call cost of the fluent Builder and BuilderTree methods. The "before" column emulates the old implementation, where every method was decorated with `tensorbuilder.core.utils.immutable` and received a defensive copy of the builder, the "after" column calls the methods of the immutable `__slots__` classes directly.
+
+    python -m tensorbuilder.benchmarks.immutable
+"""
+
+import timeit
+from tensorbuilder import tb
+from tensorbuilder.core import utils
+
+def _inc(x):
+    return x + 1
+
+def _identity(builder):
+    return builder
+
+def _branches(builder):
+    return [ builder, builder ]
+
+def _cases(width):
+    Builder, BuilderTree = tb.Builder, tb.BuilderTree
+    builder = Builder(0)
+    tree = BuilderTree([ Builder(i) for i in range(width) ])
+
+    def _methods(cls, names):
+        return { name: getattr(cls, name).im_func for name in names }
+
+    after = dict(_methods(Builder, ["map", "then", "branch"]), **{ "tree." + name: f for name, f in _methods(BuilderTree, ["map_each", "reduce", "__iter__"]).items() })
+    before = { name: utils.immutable(f) for name, f in after.items() }
+
+    def _calls(m):
+        return {
+            "map": lambda: m["map"](builder, _inc),
+            "then": lambda: m["then"](builder, _identity),
+            "branch": lambda: m["branch"](builder, _branches),
+            "tree.map_each": lambda: m["tree.map_each"](tree, _inc),
+            "tree.reduce": lambda: m["tree.reduce"](tree, max),
+            "tree.__iter__": lambda: list(m["tree.__iter__"](tree))
+        }
+
+    return _calls(before), _calls(after)
+
+def run(number=20000, width=16):
+    """
+    Returns a dict `{method: {"before": usec, "after": usec}}` with the cost per call in microseconds of each method, trees have `width` leaves.
+    """
+    before, after = _cases(width)
+
+    def _usec(f):
+        return min(timeit.repeat(f, number=number, repeat=3)) / number * 1e6
+
+    return { name: { "before": _usec(before[name]), "after": _usec(after[name]) } for name in sorted(after) }
+
+def main():
+    results = run()
+
+    print("{0:<16}{1:>12}{2:>12}{3:>10}".format("method", "before (us)", "after (us)", "speedup"))
+
+    for name in sorted(results):
+        before, after = results[name]["before"], results[name]["after"]
+        print("{0:<16}{1:>12.2f}{2:>12.2f}{3:>9.1f}x".format(name, before, after, before / after))
+
+if __name__ == '__main__':
+    main()
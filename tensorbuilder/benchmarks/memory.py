@@ -0,0 +1,78 @@
+"""
+Memory benchmark of a wide ensemble: builds a BuilderTree with 100k leaves (`fanout` subtrees of `leaves / fanout` Builders each) and measures the bytes used by the Builder and BuilderTree objects, excluding the tensors they wrap. The "before" column uses stand-in classes with an instance `__dict__` and a list of branches, the layout these classes had before they got `__slots__`.
+
+    python -m tensorbuilder.benchmarks.memory
+"""
+
+import sys
+import time
+from tensorbuilder import tb
+
+class _DictBuilder(object):
+
+    def __init__(self, tensor):
+        self._tensor = tensor
+
+class _DictBuilderTree(object):
+
+    def __init__(self, builder_iterable):
+        self._branches = list(builder_iterable)
+
+def _build(Builder, BuilderTree, leaves, fanout):
+    size = leaves // fanout
+    return BuilderTree([ BuilderTree([ Builder(i) for i in range(j * size, (j + 1) * size) ]) for j in range(fanout) ])
+
+def _footprint(tree):
+    "Bytes used by the objects of the tree, the wrapped tensors are not counted"
+    total = 0
+    stack = [ tree ]
+
+    while stack:
+        node = stack.pop()
+        total += sys.getsizeof(node)
+
+        if hasattr(node, "__dict__"):
+            total += sys.getsizeof(node.__dict__)
+
+        if hasattr(node, "_branches"):
+            total += sys.getsizeof(node._branches)
+            stack.extend(node._branches)
+
+        if hasattr(node, "_leaves"):
+            total += sys.getsizeof(node._leaves) + _layout_footprint(node._layout)
+            stack.extend(node._leaves)
+
+    return total
+
+def _layout_footprint(layout):
+    if layout is None:
+        return 0
+
+    return sys.getsizeof(layout) + sum( sys.getsizeof(entry) + _layout_footprint(entry[2]) for entry in layout )
+
+def _measure(Builder, BuilderTree, leaves, fanout):
+    start = time.time()
+    tree = _build(Builder, BuilderTree, leaves, fanout)
+    seconds = time.time() - start
+
+    return { "bytes": _footprint(tree), "seconds": seconds }
+
+def run(leaves=100000, fanout=100):
+    """
+    Returns a dict `{"before": {"bytes", "seconds"}, "after": {"bytes", "seconds"}}` for a tree with `leaves` leaves.
+    """
+    return {
+        "before": _measure(_DictBuilder, _DictBuilderTree, leaves, fanout),
+        "after": _measure(tb.Builder, tb.BuilderTree, leaves, fanout)
+    }
+
+def main():
+    results = run()
+    before, after = results["before"], results["after"]
+
+    print("{0:<10}{1:>14}{2:>14}".format("", "before", "after"))
+    print("{0:<10}{1:>14.1f}{2:>14.1f}".format("MB", before["bytes"] / 1e6, after["bytes"] / 1e6))
+    print("{0:<10}{1:>14.3f}{2:>14.3f}".format("seconds", before["seconds"], after["seconds"]))
+
+if __name__ == '__main__':
+    main()
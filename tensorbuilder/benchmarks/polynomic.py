@@ -0,0 +1,76 @@
+"""
+Benchmark of `tensorbuilder.extensions.functions.nn.polynomic`. The "before" column is the original implementation, one `tf.pow` per column followed by a pack and a transpose, the "after" column is the current one, a single broadcasted `tf.pow`. For each width it reports the ops each version creates and the best wall time in milliseconds of evaluating it on a batch.
+
+    python -m tensorbuilder.benchmarks.polynomic
+"""
+
+import time
+import numpy as np
+import tensorflow as tf
+from tensorbuilder import tb
+
+WIDTHS = [16, 64, 256]
+
+def _per_column(tensor):
+    "The original implementation, one `tf.pow` per column"
+    pack = getattr(tf, "stack", None) or tf.pack
+    pows = [ tf.pow(tensor[:, n], n + 1) for n in range(int(tensor.get_shape()[1])) ]
+    return tf.transpose(pack(pows))
+
+def _ops(graph, f):
+    "Calls `f` inside `graph`, returns its result and the number of ops it created"
+    with graph.as_default():
+        n = len(graph.get_operations())
+        h = f()
+
+    return h, len(graph.get_operations()) - n
+
+def _best(sess, h, feed, runs, repeat):
+    "Best wall time of `runs` evaluations of `h` in milliseconds"
+    times = []
+
+    for _ in range(repeat):
+        start = time.time()
+
+        for _ in range(runs):
+            sess.run(h, feed_dict=feed)
+
+        times.append(time.time() - start)
+
+    return min(times) * 1000
+
+def run(widths=WIDTHS, batch_size=256, runs=20, repeat=5):
+    """
+    Returns a dict `{width: {"before": {"ops", "ms"}, "after": {"ops", "ms"}}}`, `ms` is the best time of `runs` evaluations on a batch of `batch_size` rows.
+    """
+    results = {}
+
+    for width in widths:
+        graph = tf.Graph()
+
+        with graph.as_default():
+            x = tf.placeholder(tf.float32, shape=[None, width])
+
+        before, before_ops = _ops(graph, lambda: _per_column(x))
+        after, after_ops = _ops(graph, lambda: tb.build(x).polynomic().tensor())
+        feed = {x: np.random.uniform(-1, 1, size=(batch_size, width)).astype(np.float32)}
+
+        with tf.Session(graph=graph) as sess:
+            results[width] = {
+                "before": { "ops": before_ops, "ms": _best(sess, before, feed, runs, repeat) },
+                "after": { "ops": after_ops, "ms": _best(sess, after, feed, runs, repeat) }
+            }
+
+    return results
+
+def main():
+    results = run()
+
+    print("{0:<8}{1:>12}{2:>12}{3:>14}{4:>14}{5:>10}".format("width", "ops before", "ops after", "before (ms)", "after (ms)", "speedup"))
+
+    for width in sorted(results):
+        before, after = results[width]["before"], results[width]["after"]
+        print("{0:<8}{1:>12}{2:>12}{3:>14.2f}{4:>14.2f}{5:>9.1f}x".format(width, before["ops"], after["ops"], before["ms"], after["ms"], before["ms"] / after["ms"]))
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,11 @@
 from builders import BuilderBase, BuilderTreeBase
 from applicative import ApplicativeBase
 import utils
+import dsl
+import cse
+import plan
+import cost
+import profiler
 import concrete_classes
 
-__all__ = ["BuilderBase", "BuilderTreeBase", "ApplicativeBase", "utils", "concrete_classes"]
+__all__ = ["BuilderBase", "BuilderTreeBase", "ApplicativeBase", "utils", "dsl", "cse", "plan", "cost", "profiler", "concrete_classes"]
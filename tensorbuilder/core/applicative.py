@@ -1,5 +1,6 @@
 import inspect
 import utils
+import dsl
 import functools
 import itertools
 import tensorflow as tf
@@ -7,7 +8,7 @@ import sys
 from copy import deepcopy, copy
 from types import MethodType
 from utils import immutable
-from abc import ABCMeta, abstractmethod
+from abc import abstractmethod
 
 def _identity(x):
     return x
@@ -44,7 +45,9 @@ class ApplicativeBase(object):
 
     """
 
-    __metaclass__ = ABCMeta
+    __metaclass__ = utils.LazyMethods
+    __getattr__ = utils.lazy_getattr
+    __slots__ = ("f",)
 
     def __init__(self, f):
         super(ApplicativeBase, self).__init__()
@@ -88,9 +91,9 @@ class ApplicativeBase(object):
 
 
         """
-        return app._unit(lambda x: g(app.f(x), *args, **kwargs))
+        return app._unit(dsl.then(app.f, g, args, kwargs))
 
-    def pipe(self, builder, *ast):
+    def pipe(self, builder, *ast, **kwargs):
         """
         `pipe` takes in a `builder` of type `Builder`, `BuilderTree` or `Tensor` preferably and an object `ast` which must be part of the domain of the DSL, and compiles `ast` to a function of type `Builder -> Builder` and applies it to the input `builder`. All \*args after `builder` are taken as a tuple, therefore, it makes it easier to define an initial tuple `()` element to define a sequential operation.
 
@@ -98,6 +101,8 @@ class ApplicativeBase(object):
 
         * `builder`: a `Builder`, `BuilderTree` or `Tensor` preferably.
         * `*ast`: a sequence of elements of the DSL.
+        * `incremental`: if `True` the result of every prefix of the pipeline is memoized on the input Tensor, calling `pipe` again on the same Tensor with a pipeline that shares a prefix with a previous one (e.g. trials of an architecture search that only differ in the last layers) reuses the Builders of that prefix and only creates the ops from the first different element onward, layers of the shared prefix and their variables are reused. Elements are compared by identity, except the methods of `tb` which are compared by name and arguments. See `tensorbuilder.core.dsl.run_incremental`. (default: `False`)
+        * `name_scopes`: if `True` every element of the DSL is wrapped in a `tf.name_scope` named after its path (`step_<i>`, `branch_<i>`, `scope`) and every method call in a scope named after the method, so the ops in profiler traces can be attributed to the element that created them. See `tensorbuilder.core.dsl`. (default: `False`)
 
         **Return**
 
@@ -130,21 +135,34 @@ class ApplicativeBase(object):
             )
         """
 
-        f = _compile(ast)
+        incremental = kwargs.pop("incremental", False)
+        name_scopes = kwargs.pop("name_scopes", False)
+
+        if kwargs:
+            raise TypeError("pipe() got an unexpected keyword argument '{0}'".format(list(kwargs)[0]))
+
+        f = _compile(ast, name_scopes)
+        key = builder
 
         #if the input is a Tensor, create a Builder
-        if type(builder) is tf.python.framework.ops.Tensor:
+        if isinstance(builder, tf.Tensor):
             builder = self.Builder(builder)
+        else:
+            key = getattr(builder, "_tensor", builder)
+
+        if incremental:
+            return dsl.run_incremental(f.code, builder, key)
 
         return f(builder)
 
-    def compile(self, *ast):
+    def compile(self, *ast, **kwargs):
         """
-        `compile` an object `ast` which must be part of the domain of the DSL and returns function. It applies the rules of the DSL to create an actual Python function that does what you intend. Normally you will just use pipe, which not only compiles the DSL it actually performs the computation to a given Tensor/Builder, however, it you are building and API this might be useful since you can create a function from an AST which can itself be used as an element of another AST since final elements of the DSL are functions.
+        `compile` an object `ast` which must be part of the domain of the DSL and returns function. The `ast` is lowered into a flat `tensorbuilder.core.dsl.Program` which is executed by an interpreter loop, so the depth of the Python stack doesn't grow with the length of the pipeline. It applies the rules of the DSL to create an actual Python function that does what you intend. Normally you will just use pipe, which not only compiles the DSL it actually performs the computation to a given Tensor/Builder, however, it you are building and API this might be useful since you can create a function from an AST which can itself be used as an element of another AST since final elements of the DSL are functions.
 
         **Arguments**
 
         * `*ast`: a sequence of elements of the DSL.
+        * `name_scopes`: if `True` the elements and method calls are wrapped in name scopes derived from their path in the AST, see `tensorbuilder.core.applicative.ApplicativeBase.pipe`. (default: `False`)
 
         **Return**
 
@@ -179,7 +197,42 @@ class ApplicativeBase(object):
             h = f(x)
 
         """
-        return _compile(ast)
+        name_scopes = kwargs.pop("name_scopes", False)
+
+        if kwargs:
+            raise TypeError("compile() got an unexpected keyword argument '{0}'".format(list(kwargs)[0]))
+
+        return _compile(ast, name_scopes)
+
+    def compile_cache_info(self):
+        """
+        Returns the statistics of the cache used by `tensorbuilder.core.applicative.ApplicativeBase.compile` and `tensorbuilder.core.applicative.ApplicativeBase.pipe`. Compiled functions are cached by the structure of the AST and the identity of its functions and scopes, so calling `pipe` repeatedly with the same DSL expression skips compilation.
+
+        **Return**
+
+        A `CacheInfo(hits, misses, maxsize, currsize)` named tuple.
+
+        **Examples**
+
+            import tensorflow as tf
+            from tensorbuilder import tb
+
+            x = tf.placeholder(tf.float32, shape=[None, 10])
+            layer = tb.relu_layer(10)
+
+            for i in range(3):
+                tb.pipe(x, layer)
+
+            tb.compile_cache_info().hits # 2
+
+        """
+        return dsl.cache_info()
+
+    def compile_cache_clear(self):
+        """
+        Empties the cache used by `tensorbuilder.core.applicative.ApplicativeBase.compile` and resets its statistics.
+        """
+        dsl.cache_clear()
 
     @classmethod
     def register_method(cls, fn, library_path, alias=None, doc=None):
@@ -200,25 +253,12 @@ class ApplicativeBase(object):
         **Examples**
 
         """
-        fn_signature = utils.get_method_sig(fn)
-     	fn_docs = inspect.getdoc(fn)
         original_name = fn.__name__
         name = alias if alias else original_name
+        doc = doc if doc else utils.method_docs(_applicative_register_method_docs, original_name, library_path, name, fn)
 
         fn.__name__ = name
-        fn.__doc__ = doc if doc else """
-        THIS METHOD IS AUTOMATICALLY GENERATED
-
-        This method accepts the same arguments as `{3}.{0}`
-
-        ** Documentation from `{3}.{0}`**
-
-            def {1}
-
-        """.format(name, fn_signature, fn.__doc__, library_path)
-
-
-        setattr(cls, name, fn)
+        utils.set_method(cls, name, fn, doc)
 
 
 
@@ -228,44 +268,22 @@ ApplicativeBase.__core__ = [ _name for _name, f in inspect.getmembers(Applicativ
 ### FUNCTIONS
 #######################
 
-def _compile(ast):
-    #if type(ast) is tuple:
-
-    if type(ast) is list:
-        return _branch_function(ast)
-    elif hasattr(ast, '__call__'):
-        return ast
-    elif type(ast) is dict:
-        return _with_function(ast)
-    else:
-        return _sequence_function(ast)
-        #raise Exception("Element has to be either a tuple for sequential operations, a list for branching, or a function from a builder to a builder, got %s, %s" % (type(ast), type(ast) is tuple))
-
-
-def _compose2(f, g):
-    return lambda x: f(g(x))
-
+def _compile(ast, name_scopes=False):
+    return dsl.cached_compile(ast, name_scopes)
 
-def _compose_reversed(functions):
-    functions = functions[:]
-    functions.reverse()
-    return functools.reduce(_compose2, functions, _identity)
 
 
-def _sequence_function(tuple_ast):
-    fs = [ _compile(ast) for ast in tuple_ast ]
-    return _compose_reversed(fs)
+def _applicative_register_method_docs(original_name, library_path, name, fn_signature, fn_docs):
+    return """
+THIS METHOD IS AUTOMATICALLY GENERATED
 
-def _branch_function(list_ast):
-    fs = [ _compile(ast) for ast in list_ast ]
-    return lambda builder: builder.branch(lambda builder: [ f(builder) for f in fs ])
+This method accepts the same arguments as `{1}.{2}`
 
-def _with_function(dict_ast):
-    scope, body_ast = list(dict_ast.items())[0]
-    body = _compile(body_ast)
-    return lambda builder: builder.then_with(lambda: scope)(body)
+** Documentation from `{1}.{2}`**
 
+    def {3}
 
+    """.format(original_name, library_path, name, fn_signature, fn_docs)
 
 
 def _get_fun(_name, _f_signature, _f_docs, _module_name):
@@ -5,24 +5,27 @@
 import numpy as np
 import functools
 import utils
+import cse
+import plan
 import inspect
-from utils import immutable
 from copy import deepcopy, copy
 from types import MethodType
 import sys
-from abc import ABCMeta, abstractmethod
+from abc import abstractmethod
 
 _count = [0]
 
 class BuilderBase(object):
     """
-    The Builder class is a wrapper around a Tensor. Most of its method are immutable, that is, they don't modify the caller object but always return a new builder.
+    The Builder class is a wrapper around a Tensor. Builders are immutable, their methods never modify the caller object but always return a new builder, so they can be shared freely and never need to be copied.
 
     This class is a Functor because it has the `map` method, to be a Monad is only missing the `bind` method which is trivial to implement. This means that even if its expected that the inner element contained within a Builder is a Tensor, it can actually contian anything and you may use this to your advantage.
 
 
     """
-    __metaclass__ = ABCMeta
+    __metaclass__ = utils.LazyMethods
+    __getattr__ = utils.lazy_getattr
+    __slots__ = ("_tensor",)
 
     def __init__(self, tensor):
         super(BuilderBase, self).__init__()
@@ -35,7 +38,10 @@ class BuilderBase(object):
         pass
 
     def tensor(self):
-        "Returns the Tensor contianed by the Builder"
+        "Returns the Tensor contianed by the Builder, if the Builder is lazy its plan is materialized first"
+        if type(self._tensor) is plan.Node:
+            return plan.materialize([self._tensor])[0]
+
         return self._tensor
 
     def copy(self):
@@ -80,15 +86,12 @@ class BuilderBase(object):
             tb.Builder.register_method(relu_dropout_layer, "my.lib", alias="relu_dropout_layer")
         """
 
-        fn_signature = utils.get_method_sig(fn)
-     	fn_docs = inspect.getdoc(fn)
         original_name = fn.__name__
         name = alias if alias else original_name
+        doc = doc if doc else utils.method_docs(_builder_register_method_docs, original_name, library_path, name, fn)
 
         fn.__name__ = name
-        fn.__doc__ = doc if doc else _builder_register_method_docs(original_name, library_path, name, fn_signature, fn_docs)
-
-        setattr(cls, name, fn)
+        utils.set_method(cls, name, fn, doc)
         #exec("Builder.{0} = fn".format(name))
 
 
@@ -117,19 +120,15 @@ class BuilderBase(object):
 
             tb.Builder.register_map_method(tf.reshape, "tf")
         """
-        fn_signature = utils.get_method_sig(fn)
-     	fn_docs = inspect.getdoc(fn)
         original_name = fn.__name__
         name = alias if alias else original_name
+        doc = doc if doc else utils.method_docs(_builder_register_map_method_docs, original_name, library_path, name, fn)
 
         lifted = _lift(fn)
         lifted.__name__ = name
-        lifted.__doc__ = doc if doc else _builder_register_map_method_docs(original_name, library_path, name, fn_signature, fn_docs)
-
-        setattr(cls, name, lifted)
+        utils.set_method(cls, name, lifted, doc)
 
 
-    @immutable
     def map(builder, fn, *args, **kwargs):
         """
         `@immutable`
@@ -185,10 +184,17 @@ class BuilderBase(object):
             print(h)
 
         """
-        tensor = fn(builder.tensor(), *args, **kwargs)
+        if type(builder._tensor) is plan.Node:
+            return builder._unit(plan.record_map(builder._tensor, fn, args, kwargs))
+
+        caches = cse.state.caches
+
+        if caches:
+            return caches[-1].map(builder, fn, args, kwargs)
+
+        tensor = fn(builder._tensor, *args, **kwargs)
         return builder._unit(tensor)
 
-    @immutable
     def then(builder, fn, *args, **kwargs):
         """
         `@immutable`
@@ -208,7 +214,6 @@ class BuilderBase(object):
         """
         return fn(builder, *args, **kwargs)
 
-    @immutable
     def branch(builder, fn):
         """
         `@immutable`
@@ -266,7 +271,6 @@ class BuilderBase(object):
         """
         return builder.BuilderTree(fn(builder))
 
-    @immutable
     def then_with(builder, scope_fn, *args, **kwargs):
         """
         `@immutable`
@@ -354,12 +358,16 @@ class BuilderBase(object):
 
         """
         def _lambda(fn):
-            with scope_fn(*args, **kwargs):
+            if type(builder._tensor) is plan.Node:
+                scope = plan.Scope(lambda: scope_fn(*args, **kwargs), reusable=True)
+            else:
+                scope = cse.Scope(scope_fn(*args, **kwargs))
+
+            with scope:
                 y = fn(builder)
             return y
         return _lambda
 
-    @immutable
     def __iter__(builder):
         yield builder
 
@@ -367,16 +375,20 @@ class BuilderBase(object):
 class BuilderTreeBase(object):
     """
     BuilderTree is a class that enables you to perform computations over a complex branched builder. It contains methods to handle the leaf `tensorbuilder.core.builders.Builder` nodes.
+
+    The tree is stored flat: `_leaves` contains all the leaf Builders in order and `_layout` describes the nesting, so iterating, indexing and getting the tensors of the leaves doesn't recurse no matter how deep the branching is. The nested view is available through `tensorbuilder.core.builders.BuilderTree.children`.
     """
 
-    __metaclass__ = ABCMeta
+    __metaclass__ = utils.LazyMethods
+    __getattr__ = utils.lazy_getattr
+    __slots__ = ("_leaves", "_layout")
 
     def __init__(self, builder_iterable):
         super(BuilderTreeBase, self).__init__()
 
-        self._branches = list(builder_iterable)
+        self._leaves, self._layout = _flatten(builder_iterable)
         """
-        An iterable that can contain elements that are of type `tensorbuilder.core.builders.Builder` or `tensorbuilder.core.builders.BuilderTree`.
+        `_leaves` is a tuple with the leaf `tensorbuilder.core.builders.Builder`s. `_layout` is `None` if every leaf is a direct branch of the tree, else a tuple of `(start, end, layout)` entries, one for each branch that is itself a tree, where `_leaves[start:end]` are the leaves of that branch and `layout` describes its nesting relative to `start`.
         """
 
     @abstractmethod
@@ -384,24 +396,32 @@ class BuilderTreeBase(object):
         pass
 
     def copy(self):
-        return self._unit(self._branches)
+        return self._from_leaves(self._leaves, self._layout)
 
     def _unit(self, branches):
         return self.__class__(branches)
 
+    def _from_leaves(self, leaves, layout):
+        tree = self.__class__.__new__(self.__class__)
+        tree._leaves = leaves
+        tree._layout = layout
+        return tree
 
 
-    @immutable
-    def reduce(tree, fn, initializer=None):
+
+    def reduce(tree, fn, initializer=None, balanced=None):
         """
         `@immutable`
 
         Expects a function **fn** with type `(Tensor, Tensor) -> Tensor` and optionally an `initializer` and applies python [reduce](https://docs.python.org/2/library/functions.html#reduce) function to `tensorbuilder.core.builders.BuilderTree.tensors` using these arguments; the resulting Tensor is the wrapped inside a Builder.
 
+        If `fn` was registered with `tensorbuilder.core.builders.BuilderTree.register_associative_reduce` (e.g. `tf.add`, `tf.maximum` and `tf.multiply`) the reduction is done with its n-ary reducer (`tf.add_n` for `tf.add` when the tensors have the same fully defined shape) or as a balanced binary tree, so the result has logarithmic instead of linear depth.
+
         **Parameters**
 
         * `fn`: a function of type `(Tensor, Tensor) -> Tensor`.
         * `initializer`: an optional Tensor as initial element of the folding operation (default: `None`)s
+        * `balanced`: `True` reduces `fn` as a balanced tree (`fn` must be associative), `False` always does a left fold. If `None` (default) the reduction is balanced only if `fn` was registered as associative.
 
         **Return**
 
@@ -457,14 +477,61 @@ class BuilderTreeBase(object):
                 .tensor()
             )
         """
-        if initializer != None:
-            tensor = functools.reduce(fn, tree.tensors(), initializer)
-        else:
-            tensor = functools.reduce(fn, tree.tensors())
+        tensors = [ builder._tensor for builder in tree._leaves ]
 
-        return tree.Builder(tensor)
+        def _reduce(tensors):
+            if initializer is not None:
+                tensors = [ initializer ] + tensors
+
+            reduce_n = tree._associative_reducer(fn)
+
+            if not (reduce_n is not None if balanced is None else balanced):
+                return functools.reduce(fn, tensors)
+            elif reduce_n is not None:
+                return reduce_n(tensors)
+            else:
+                return utils.balanced_reduce(fn, tensors)
+
+        if plan.any_lazy(tensors):
+            return tree.Builder(plan.record_reduce(tensors, fn, _reduce, initializer=initializer, balanced=balanced))
+
+        return tree.Builder(_reduce(tensors))
+
+    @classmethod
+    def register_associative_reduce(cls, fn, reduce_n=None):
+        """
+        Registers `fn` as an associative function so `tensorbuilder.core.builders.BuilderTree.reduce` can reduce it as a balanced tree instead of a left fold.
+
+        **Arguments**
+
+        * `fn`: an associative function of type `(Tensor, Tensor) -> Tensor`.
+        * `reduce_n`: an optional function of type `list( Tensor ) -> Tensor` that reduces all the tensors at once. If `None` the tensors are reduced with `tensorbuilder.core.utils.balanced_reduce`.
+
+        **Return**
+
+        `None`
+
+        **Examples**
+
+            import tensorflow as tf
+            from tensorbuilder import tb
+
+            tb.BuilderTree.register_associative_reduce(tf.minimum)
+        """
+        if '_associative_reducers' not in cls.__dict__:
+            cls._associative_reducers = {}
+
+        cls._associative_reducers[fn] = reduce_n if reduce_n else functools.partial(utils.balanced_reduce, fn)
+
+    def _associative_reducer(tree, fn):
+        for klass in type(tree).__mro__:
+            reducers = klass.__dict__.get('_associative_reducers')
+
+            if reducers and fn in reducers:
+                return reducers[fn]
+
+        return None
 
-    @immutable
     def map_each(tree, fn, *args, **kwargs):
         """
         `@immutable`
@@ -536,10 +603,9 @@ class BuilderTreeBase(object):
                 .tensor()
             )
         """
-        branches = [ builder.map(fn, *args, **kwargs) for builder in tree ]
-        return tree._unit(branches)
+        leaves = tuple(builder.map(fn, *args, **kwargs) for builder in tree._leaves)
+        return tree._from_leaves(leaves, tree._layout)
 
-    @immutable
     def extract(tree, fn, *args, **kwargs):
         """
         `@immutable`
@@ -601,7 +667,12 @@ class BuilderTreeBase(object):
                 .tensor()
             )
         """
-        tensor = fn(tree.tensors(), *args, **kwargs)
+        tensors = [ builder._tensor for builder in tree._leaves ]
+
+        if plan.any_lazy(tensors):
+            return tree.Builder(plan.record_extract(tensors, fn, args, kwargs))
+
+        tensor = fn(tensors, *args, **kwargs)
         return tree.Builder(tensor)
 
 
@@ -648,15 +719,12 @@ class BuilderTreeBase(object):
 
             tb.BuilderTree.register_method(_tree_fully_connected, "tensorbuilder.patches.tensorflow.fully_connected", alias="fully_connected")
         """
-        fn_signature = utils.get_method_sig(fn)
-     	fn_docs = inspect.getdoc(fn)
         original_name = fn.__name__
         name = alias if alias else original_name
+        doc = doc if doc else utils.method_docs(_tree_register_method_docs, original_name, library_path, name, fn)
 
         fn.__name__ = name
-        fn.__doc__ = doc if doc else _tree_register_method_docs(original_name, library_path, name, fn_signature, fn_docs)
-
-        setattr(cls, name, fn)
+        utils.set_method(cls, name, fn, doc)
 
     @classmethod
     def register_reduce_method(cls, fn, library_path, alias=None, doc=None):
@@ -683,17 +751,14 @@ class BuilderTreeBase(object):
 
             tb.BuilderTree.register_reduce_method(tf.add, "tf", alias="reduce_add")
         """
-        fn_signature = utils.get_method_sig(fn)
-     	fn_docs = inspect.getdoc(fn)
         original_name = fn.__name__
         name = alias if alias else original_name
+        doc = doc if doc else utils.method_docs(_tree_register_reduce_method_docs, original_name, library_path, name, fn)
 
         _tree_method = _lift_tree_reduce(fn)
 
         _tree_method.__name__ = name
-        _tree_method.__doc__ = doc if doc else _tree_register_reduce_method_docs(original_name, library_path, name, fn_signature, fn_docs)
-
-        setattr(cls, name, _tree_method)
+        utils.set_method(cls, name, _tree_method, doc)
 
 
     def builders(self):
@@ -758,7 +823,7 @@ class BuilderTreeBase(object):
             )
 
         """
-        return [ builder for builder in self ]
+        return list(self._leaves)
 
     def tensors(self):
         """
@@ -822,19 +887,108 @@ class BuilderTreeBase(object):
             )
 
         """
-        return [ builder._tensor for builder in self ]
+        tensors = [ builder._tensor for builder in self._leaves ]
+
+        if plan.any_lazy(tensors):
+            return plan.materialize(tensors)
+
+        return tensors
+
+    def children(self):
+        """
+        Returns the direct branches of this tree, the nested view of `tensorbuilder.core.builders.BuilderTree.builders`. Branches that were trees are returned as `tensorbuilder.core.builders.BuilderTree`s.
+
+        **Return**
+
+        * `list( tensorbuilder.core.builders.Builder | tensorbuilder.core.builders.BuilderTree )`
+
+        ** Examples **
+
+            import tensorflow as tf
+            from tensorbuilder import tb
+
+            x = tf.placeholder(tf.float32, shape=[None, 5])
+
+            tree = tb.pipe(
+                x,
+                [
+                    tb.relu_layer(10)
+                ,
+                    [
+                        tb.sigmoid_layer(10)
+                    ,
+                        tb.tanh_layer(10)
+                    ]
+                ]
+            )
 
+            len(tree) # 3 leaves
+            relu, sub_tree = tree.children()
+            len(sub_tree) # 2 leaves
+        """
+        return list(_children(self))
 
-    @immutable
     def __iter__(tree):
-        """A generator function that lazily returns all the Builders contianed by this tree"""
-        for branch in tree._branches:
-            for builder in branch:
-                yield builder
+        """Returns an iterator over all the Builders contianed by this tree"""
+        return iter(tree._leaves)
+
+    def __len__(tree):
+        """Returns the number of leaf Builders of this tree"""
+        return len(tree._leaves)
+
+    def __getitem__(tree, index):
+        """Returns the leaf Builder at position `index`, a slice returns a tuple of Builders"""
+        return tree._leaves[index]
 
 
 
 ## Module Funs
+# isinstance checks against ABCMeta classes are slow, cache them by type
+_builder_types = {}
+
+def _is_builder(branch):
+    _type = type(branch)
+    is_builder = _builder_types.get(_type)
+
+    if is_builder is None:
+        is_builder = _builder_types[_type] = isinstance(branch, BuilderBase)
+
+    return is_builder
+
+def _flatten(builder_iterable):
+    leaves = []
+    layout = []
+
+    for branch in builder_iterable:
+        if _is_builder(branch):
+            leaves.append(branch)
+            continue
+
+        if isinstance(branch, BuilderTreeBase):
+            branch_leaves, branch_layout = branch._leaves, branch._layout
+        else:
+            branch_leaves, branch_layout = _flatten(branch)
+
+        start = len(leaves)
+        leaves.extend(branch_leaves)
+        layout.append((start, len(leaves), branch_layout))
+
+    return tuple(leaves), tuple(layout) if layout else None
+
+def _children(tree):
+    leaves = tree._leaves
+    position = 0
+
+    for start, end, layout in tree._layout or ():
+        for i in range(position, start):
+            yield leaves[i]
+
+        yield tree._from_leaves(leaves[start:end], layout)
+        position = end
+
+    for i in range(position, len(leaves)):
+        yield leaves[i]
+
 def _tree_register_reduce_method_docs(original_name, library_path, name, fn_signature, fn_docs):
     return """
 THIS METHOD IS AUTOMATICALLY GENERATED
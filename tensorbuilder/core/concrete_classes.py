@@ -3,6 +3,8 @@
 def get(BuilderBase, BuilderTreeBase, ApplicativeBase):
     class Builder(BuilderBase):
         """docstring for Builder"""
+        __slots__ = ()
+
         def __init__(self, tensor):
             super(Builder, self).__init__(tensor)
 
@@ -11,6 +13,8 @@ def get(BuilderBase, BuilderTreeBase, ApplicativeBase):
 
     class BuilderTree(BuilderTreeBase):
         """docstring for BuilderTree"""
+        __slots__ = ()
+
         def __init__(self, builder_iterable):
             super(BuilderTree, self).__init__(builder_iterable)
 
@@ -19,6 +23,8 @@ def get(BuilderBase, BuilderTreeBase, ApplicativeBase):
 
     class Applicative(ApplicativeBase):
         """docstring for Applicative"""
+        __slots__ = ()
+
         def __init__(self, f):
             super(Applicative, self).__init__(f)
 
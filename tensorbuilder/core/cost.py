@@ -0,0 +1,148 @@
+"""
+Static cost model of DSL expressions. `estimate` compiles an AST and executes its instructions on shapes instead of Tensors: each method of `tb` is looked up by name in a registry of estimators that compute the output shape, the number of parameters and the multiply-adds of the call without creating any ops, so candidate architectures can be rejected in milliseconds.
+
+An estimator is a function `(shape, *args, **kwargs) -> (shape, params, flops)` that receives the per example shape of the input (without the batch dimension) plus the arguments of the method. Estimators registered with `tree=True` are used when the method is called on a BuilderTree and receive the list of shapes of its leaves instead.
+
+Methods without an estimator are assumed to keep the shape and to be free, their names are listed in `Estimate.unknown`.
+"""
+
+import dsl
+import functools
+
+_estimators = {}
+_tree_estimators = {}
+_resolvers = []
+
+class Estimate(object):
+    """
+    Result of `estimate`.
+
+    * `nodes`: a list with a dict per method call with its `method` name, output `shape` (including the batch dimension), `params`, `activations` (elements per example) and `flops` (multiply-adds per example).
+    * `params`, `activations`, `flops`: the totals.
+    * `activation_bytes`: the memory per example taken by the activations.
+    * `output_shape`: the shape of the result, a list of shapes if its a BuilderTree.
+    * `unknown`: the names of the methods that had no estimator.
+    """
+
+    def __init__(self, nodes, output_shape, unknown, bytes_per_element):
+        self.nodes = nodes
+        self.output_shape = output_shape
+        self.unknown = unknown
+        self.params = sum( node["params"] for node in nodes )
+        self.activations = sum( node["activations"] for node in nodes )
+        self.flops = sum( node["flops"] for node in nodes )
+        self.activation_bytes = self.activations * bytes_per_element
+
+    def __repr__(self):
+        return "Estimate(params={0}, flops={1}, activation_bytes={2}, output_shape={3})".format(self.params, self.flops, self.activation_bytes, self.output_shape)
+
+
+def register_estimator(name, estimator, tree=False):
+    """
+    Registers `estimator` for the method `name` of the Builder, or of the BuilderTree if `tree` is `True`.
+    """
+    (_tree_estimators if tree else _estimators)[name] = estimator
+
+def register_resolver(resolver):
+    """
+    Registers a function `(name, tree) -> estimator | None` used for methods without a registered estimator, useful when the names are not known in advance (e.g. the `*_layer` methods).
+    """
+    _resolvers.append(resolver)
+
+def get_estimator(name, tree=False):
+    estimator = (_tree_estimators if tree else _estimators).get(name)
+
+    if estimator is None:
+        for resolver in _resolvers:
+            estimator = resolver(name, tree)
+
+            if estimator is not None:
+                break
+
+    return estimator
+
+def estimate(ast, input_shape, bytes_per_element=4):
+    """
+    Estimates the cost of applying `ast` to a Tensor of shape `input_shape` (including the batch dimension, e.g. `[None, 784]`), returns an `Estimate`.
+    """
+    nodes = []
+    unknown = []
+    value = tuple(input_shape[1:])
+    stack = []
+
+    for op, fn, args, kwargs in dsl.compile(ast).code:
+        if op == dsl.CALL:
+            value = _call(fn, args, kwargs, value, nodes, unknown)
+
+        elif op == dsl.BRANCH:
+            stack.append((value, []))
+
+        elif op == dsl.COLLECT:
+            _input, collected = stack[-1]
+            collected.append(value)
+            value = _input
+
+        elif op == dsl.MERGE:
+            _input, collected = stack.pop()
+            value = _leaves(collected)
+
+        # scopes don't change the cost
+
+    return Estimate(nodes, _with_batch(value, input_shape[0]), unknown, bytes_per_element)
+
+def elementwise(shape, *args, **kwargs):
+    "Estimator of the functions that keep the shape and have no parameters"
+    return shape, 0, 0
+
+def identity(shape, *args, **kwargs):
+    return shape, 0, 0
+
+
+def _call(fn, args, kwargs, value, nodes, unknown):
+    if fn is dsl.call_method:
+        name, args = args[0], args[1:]
+    else:
+        name = getattr(fn, "__name__", repr(fn))
+
+    tree = type(value) is list
+    estimator = get_estimator(name, tree) if fn is dsl.call_method else None
+
+    if estimator is None:
+        unknown.append(name)
+        return value
+
+    shape, params, flops = estimator(value, *args, **kwargs)
+
+    if estimator is not identity:
+        nodes.append({
+            "method": name,
+            "shape": _with_batch(shape, None),
+            "params": params,
+            "activations": _activations(shape),
+            "flops": flops
+        })
+
+    return shape
+
+def _leaves(values):
+    leaves = []
+
+    for value in values:
+        if type(value) is list:
+            leaves.extend(value)
+        else:
+            leaves.append(value)
+
+    return leaves
+
+def _activations(shape):
+    if type(shape) is list:
+        return sum( _activations(leaf) for leaf in shape )
+
+    return functools.reduce(lambda a, b: a * (b or 1), shape, 1)
+
+def _with_batch(shape, batch):
+    if type(shape) is list:
+        return [ _with_batch(leaf, batch) for leaf in shape ]
+
+    return (batch,) + tuple(shape)
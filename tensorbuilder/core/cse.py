@@ -0,0 +1,126 @@
+"""
+Opt-in common subexpression elimination for `tensorbuilder.core.builders.Builder.map`. Inside a `CSE` context identical calls, same input tensor, same function and same hashable arguments, return the tensor built by the first call instead of creating new ops.
+
+Only pure calls should be deduplicated. Calls that create variables (layers) or stateful ops (e.g. the random ops of `tf.nn.dropout`) are never cached, calls made inside different scopes of the DSL (or `Builder.then_with`) never share results, and any other function can be left out with the `only` filter.
+"""
+
+import utils
+import threading
+import tensorflow as tf
+
+class _State(threading.local):
+
+    def __init__(self):
+        self.caches = []
+        self.scopes = ()
+
+state = _State()
+
+class CSE(object):
+    """
+    Context manager that enables common subexpression elimination of `Builder.map` calls on the current thread.
+
+    **Arguments**
+
+    * `only`: an optional iterable of functions, if given only calls to these functions are deduplicated.
+    """
+
+    def __init__(self, only=None):
+        self.only = frozenset(only) if only is not None else None
+        self.entries = {}
+        self.calls = 0
+        self.hits = 0
+        self.ops = 0
+        self.by_function = {}
+
+    def __enter__(self):
+        state.caches.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        state.caches.remove(self)
+
+    def map(self, builder, fn, args, kwargs):
+        tensor = builder._tensor
+
+        try:
+            if self.only is not None and fn not in self.only:
+                key = None
+            else:
+                key = (state.scopes, tensor, fn, utils.freeze(args, kwargs))
+                entry = self.entries.get(key)
+        except TypeError: #unhashable
+            key = None
+
+        if key is None:
+            return builder._unit(fn(tensor, *args, **kwargs))
+
+        self.calls += 1
+
+        if entry is not None:
+            result, ops = entry
+            name = getattr(fn, "__name__", repr(fn))
+
+            self.hits += 1
+            self.ops += ops
+            self.by_function[name] = self.by_function.get(name, 0) + 1
+
+            return builder._unit(result)
+
+        graph = getattr(tensor, "graph", None)
+
+        if graph is None:
+            result = fn(tensor, *args, **kwargs)
+            self.entries[key] = (result, 0)
+            return builder._unit(result)
+
+        version, variables = graph.version, len(graph.get_collection_ref(_VARIABLES))
+        result = fn(tensor, *args, **kwargs)
+
+        ops = graph.version - version
+
+        if len(graph.get_collection_ref(_VARIABLES)) == variables and not _stateful(graph, ops):
+            self.entries[key] = (result, ops)
+
+        return builder._unit(result)
+
+    def report(self):
+        """
+        Returns a dict with the number of `calls` that were eligible, the `deduplicated` calls, the number of `ops` that weren't created thanks to them and the deduplicated calls of each function in `functions`.
+        """
+        return {
+            "calls": self.calls,
+            "deduplicated": self.hits,
+            "ops": self.ops,
+            "functions": dict(self.by_function)
+        }
+
+class Scope(object):
+    """
+    Wraps a context manager entered by the DSL or `Builder.then_with` so calls inside it don't share results with calls outside it.
+    """
+
+    __slots__ = ("scope", "outer")
+
+    def __init__(self, scope):
+        self.scope = scope
+
+    def __enter__(self):
+        value = self.scope.__enter__()
+        self.outer = state.scopes
+        state.scopes = self.outer + (self.scope,)
+        return value
+
+    def __exit__(self, *exc_info):
+        state.scopes = self.outer
+        return self.scope.__exit__(*exc_info)
+
+def _stateful(graph, ops):
+    "Whether any of the last `ops` ops of `graph` is stateful"
+    if ops <= 0:
+        return False
+
+    return any( op.op_def is not None and op.op_def.is_stateful for op in graph.get_operations()[-ops:] )
+
+
+_VARIABLES = getattr(tf.GraphKeys, "GLOBAL_VARIABLES", None) or tf.GraphKeys.VARIABLES
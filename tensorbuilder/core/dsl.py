@@ -0,0 +1,556 @@
+"""
+Compiler of the DSL. An AST made of tuples (sequential operations), lists (branches), dicts (scopes) and functions is lowered into a flat `Program`, a list of instructions executed by a small interpreter loop. The Python stack doesn't grow with the length of the pipeline, so generated architectures with hundreds of stages can be compiled and executed without hitting the recursion limit.
+
+Each instruction is a tuple `(op, fn, args, kwargs)`:
+
+* `CALL`: `value = fn(value, *args, **kwargs)`
+* `BRANCH`: starts a branching, the current value is saved as the input of every branch.
+* `COLLECT`: ends the body of a branch, its value is collected and the input of the branching is restored.
+* `MERGE`: ends a branching, `value = input.branch(lambda builder: collected)`.
+* `ENTER`: enters the context manager returned by `fn()`.
+* `EXIT`: exits the last context manager that was entered.
+
+`run_incremental` executes a program reusing the results of the longest prefix it shares with programs that were previously executed on the same input, see `tensorbuilder.core.applicative.ApplicativeBase.pipe`.
+
+With `name_scopes=True` the compiler also wraps every element of the AST in a `tf.name_scope` named after its path, `step_<i>` for the elements of a sequence, `branch_<i>` for the branches of a list and `scope` for the bodies of dicts, and every call in a scope named after the method (or function) it calls, so the ops of a profiler trace map back to the element of the DSL that created them, e.g. `step_1/branch_0/relu_layer/fully_connected/MatMul`.
+
+`cached_compile` memoizes compiled programs in a bounded LRU cache keyed by the structure of the AST (the shape of its tuples, lists and dicts plus the identity of its functions and scopes), its size is taken from the environment variable `TENSORBUILDER_COMPILE_CACHE` (default `256`, `0` disables it). An entry holds strong references to the functions and scopes of its AST (and so to whatever they close over, e.g. graphs and tensors) until it is evicted or `cache_clear` is called, since keys are made of their ids and an id can't be reused while its entry exists.
+"""
+
+import os
+import re
+import sys
+import threading
+import utils
+import applicative
+import cse
+import plan
+import tensorflow as tf
+from collections import OrderedDict, namedtuple
+
+CALL = 0
+BRANCH = 1
+COLLECT = 2
+MERGE = 3
+ENTER = 4
+EXIT = 5
+
+_NO_ARGS = ()
+_NO_KWARGS = {}
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+class Program(object):
+    """
+    A function compiled from an AST of the DSL, calling it executes its instructions on the given value.
+
+    `then` doesn't copy the instructions, the new `Program` points to the one it extends plus its last instruction and the chain is flattened into a tuple the first time `code` is read (usually when the program is executed), so a chain of N fluent calls is built in O(N).
+    """
+
+    __slots__ = ("_code", "_previous", "_instruction", "_length")
+
+    def __init__(self, code):
+        self._code = tuple(code)
+        self._previous = None
+        self._instruction = None
+        self._length = len(self._code)
+
+    @property
+    def code(self):
+        "The instructions of the program as a tuple"
+        if self._code is None:
+            self._flatten()
+
+        return self._code
+
+    def __call__(self, value):
+        return run(self.code, value)
+
+    def then(self, fn, *args, **kwargs):
+        """
+        Returns a new `Program` that calls `fn` on the result of this one, `*args` and `**kwargs` are forwarded to `fn`.
+        """
+        return self._then((CALL, fn, args, kwargs))
+
+    def __len__(self):
+        return self._length
+
+    def __repr__(self):
+        return "Program({0} instructions)".format(self._length)
+
+    def _then(self, instruction):
+        program = Program.__new__(Program)
+        program._code = None
+        program._previous = self
+        program._instruction = instruction
+        program._length = self._length + 1
+        return program
+
+    def _flatten(self):
+        # walks back to the closest flattened program, the chain can be too long to recurse
+        tail = []
+        program = self
+
+        while program._code is None:
+            tail.append(program._instruction)
+            program = program._previous
+
+        tail.reverse()
+        self._code = program._code + tuple(tail)
+        self._previous = self._instruction = None
+
+
+def compile(ast, name_scopes=False):
+    """
+    Lowers `ast` into a `Program`. `Program`s and `Applicative`s that wrap a `Program` are inlined instead of being called as opaque functions. If `name_scopes` is `True` the elements of the AST and the calls are wrapped in name scopes derived from their path and the method they call.
+    """
+    code = []
+
+    if name_scopes:
+        _lower_named(ast, code)
+    else:
+        _lower(ast, code)
+
+    return Program(code)
+
+def cached_compile(ast, name_scopes=False):
+    """
+    Like `compile` but returns the same `Program` for ASTs with the same structure and the same leaves. The leaves of cached ASTs are kept alive until their entry is evicted, call `cache_clear` to release them.
+    """
+    return _cache.get(ast, name_scopes)
+
+def cache_info():
+    """
+    Returns a `CacheInfo(hits, misses, maxsize, currsize)` with the statistics of the compile cache.
+    """
+    return _cache.info()
+
+def cache_clear():
+    """
+    Empties the compile cache and resets its statistics.
+    """
+    _cache.clear()
+
+def set_cache_size(maxsize):
+    """
+    Sets the maximum number of programs kept by the compile cache, `0` disables it.
+    """
+    _cache.resize(maxsize)
+
+def then(f, g, args=_NO_ARGS, kwargs=_NO_KWARGS):
+    """
+    Returns a `Program` that computes `g(f(x), *args, **kwargs)`. Used by `tensorbuilder.core.applicative.ApplicativeBase.compose` so chains of fluent calls stay flat.
+    """
+    if isinstance(f, Program):
+        return f._then((CALL, g, args, kwargs))
+
+    return Program(((CALL, f, _NO_ARGS, _NO_KWARGS), (CALL, g, args, kwargs)))
+
+def run(code, value):
+    """
+    Executes the instructions in `code` on `value` and returns the result. If an instruction raises, the scopes that were entered are exited with the exception before it propagates.
+    """
+    # branch frames are tuples (input, collected), scope frames are context managers
+    stack = []
+
+    try:
+        for op, fn, args, kwargs in code:
+            if op == CALL:
+                value = fn(value, *args, **kwargs)
+
+            elif op == BRANCH:
+                stack.append((value, []))
+
+            elif op == COLLECT:
+                _input, collected = stack[-1]
+                collected.append(value)
+                value = _input
+
+            elif op == MERGE:
+                _input, collected = stack.pop()
+                value = _input.branch(lambda builder: collected)
+
+            elif op == ENTER:
+                scope = _scope(fn, value)
+                scope.__enter__()
+                stack.append(scope)
+
+            else: #EXIT
+                stack.pop().__exit__(None, None, None)
+
+    except:
+        exc_info = sys.exc_info()
+        _unwind(stack, exc_info)
+        raise exc_info[0], exc_info[1], exc_info[2]
+
+    return value
+
+
+def call_method(builder, _method_name, *args, **kwargs):
+    """
+    Calls the method `_method_name` of `builder`. The methods of the Applicative are compiled into calls to this function so the instruction describes the method by its name and arguments, which lets `run_incremental` recognize calls made by different Applicatives.
+    """
+    return getattr(builder, _method_name)(*args, **kwargs)
+
+def run_incremental(code, value, key=None):
+    """
+    Like `run` but memoizes the state of the interpreter after each instruction of `code` in a trie attached to `key` (default: `value`), the next program executed with the same `key` resumes from the state after the longest prefix of instructions it has in common with the previous ones. Only states where no scope is open can be resumed, instructions whose arguments are not hashable end the memoized prefix.
+
+    The trie is stored as an attribute of `key` (usually the input Tensor) so it lives as long as `key` does, if `key` doesn't accept attributes the program is executed with `run`.
+    """
+    key = value if key is None else key
+    node = getattr(key, _PREFIXES, None)
+
+    if node is None:
+        node = _Prefix((value, ()))
+
+        try:
+            setattr(key, _PREFIXES, node)
+        except (AttributeError, TypeError):
+            return run(code, value)
+
+    # find the deepest resumable state along the common prefix
+    resume, position = node, 0
+
+    for i, instruction in enumerate(code):
+        node = node.children.get(_instruction_key(instruction)) if node is not None else None
+
+        if node is None:
+            break
+
+        if node.state is not None:
+            resume, position = node, i + 1
+
+    value, frames = resume.state
+    stack = [ (_input, list(collected)) for _input, collected in frames ]
+    node = resume
+
+    try:
+        for i in range(position, len(code)):
+            value = _step(code[i], value, stack)
+
+            if node is not None:
+                node = node.child(code[i])
+
+            if node is not None and node.state is None and not _has_scopes(stack):
+                node.state = (value, tuple( (_input, tuple(collected)) for _input, collected in stack ))
+
+    except:
+        exc_info = sys.exc_info()
+        _unwind(stack, exc_info)
+        raise exc_info[0], exc_info[1], exc_info[2]
+
+    return value
+
+def incremental_cache_clear(key):
+    """
+    Forgets the prefixes memoized by `run_incremental` for `key`.
+    """
+    if getattr(key, _PREFIXES, None) is not None:
+        delattr(key, _PREFIXES)
+
+
+def _step(instruction, value, stack):
+    "Executes a single instruction, same semantics as the loop of `run`"
+    op, fn, args, kwargs = instruction
+
+    if op == CALL:
+        return fn(value, *args, **kwargs)
+
+    elif op == BRANCH:
+        stack.append((value, []))
+
+    elif op == COLLECT:
+        _input, collected = stack[-1]
+        collected.append(value)
+        return _input
+
+    elif op == MERGE:
+        _input, collected = stack.pop()
+        return _input.branch(lambda builder: collected)
+
+    elif op == ENTER:
+        scope = _scope(fn, value)
+        scope.__enter__()
+        stack.append(scope)
+
+    else: #EXIT
+        stack.pop().__exit__(None, None, None)
+
+    return value
+
+def _scope(factory, value):
+    if plan.is_lazy(value):
+        # a name scope can be created again, a scope of the AST is a single object
+        return plan.Scope(factory, reusable=type(factory) is _NameScope)
+
+    return cse.Scope(factory())
+
+def _has_scopes(stack):
+    for frame in stack:
+        if type(frame) is not tuple:
+            return True
+
+    return False
+
+def _instruction_key(instruction):
+    op, fn, args, kwargs = instruction
+
+    try:
+        return (op, fn, utils.freeze(args, kwargs))
+    except TypeError:
+        return None
+
+class _Prefix(object):
+    "A node of the trie of `run_incremental`, `state` is `(value, frames)` or `None` if the state can't be resumed"
+
+    __slots__ = ("children", "state")
+
+    def __init__(self, state=None):
+        self.children = {}
+        self.state = state
+
+    def child(self, instruction):
+        key = _instruction_key(instruction)
+
+        if key is None:
+            return None
+
+        node = self.children.get(key)
+
+        if node is None:
+            node = self.children[key] = _Prefix()
+
+        return node
+
+_PREFIXES = "_tensorbuilder_prefixes"
+
+
+def _lower(ast, code):
+    if type(ast) is list:
+        code.append((BRANCH, None, _NO_ARGS, _NO_KWARGS))
+
+        for branch_ast in ast:
+            _lower(branch_ast, code)
+            code.append((COLLECT, None, _NO_ARGS, _NO_KWARGS))
+
+        code.append((MERGE, None, _NO_ARGS, _NO_KWARGS))
+
+    elif hasattr(ast, '__call__'):
+        program = _program(ast)
+
+        if program is not None:
+            code.extend(program.code)
+        else:
+            code.append((CALL, ast, _NO_ARGS, _NO_KWARGS))
+
+    elif type(ast) is dict:
+        scope, body_ast = list(ast.items())[0]
+
+        code.append((ENTER, _constant(scope), _NO_ARGS, _NO_KWARGS))
+        _lower(body_ast, code)
+        code.append((EXIT, None, _NO_ARGS, _NO_KWARGS))
+
+    else:
+        for element_ast in ast:
+            _lower(element_ast, code)
+
+def _lower_named(ast, code, name=None):
+    "Like `_lower` but wraps the elements in name scopes, `name` is the scope of `ast` given by its parent"
+    start = len(code)
+
+    if type(ast) is list:
+        code.append((BRANCH, None, _NO_ARGS, _NO_KWARGS))
+
+        for i, branch_ast in enumerate(ast):
+            _lower_named(branch_ast, code, "branch_{0}".format(i))
+            code.append((COLLECT, None, _NO_ARGS, _NO_KWARGS))
+
+        code.append((MERGE, None, _NO_ARGS, _NO_KWARGS))
+
+    elif hasattr(ast, '__call__'):
+        program = _program(ast)
+        instructions = program.code if program is not None else ((CALL, ast, _NO_ARGS, _NO_KWARGS),)
+
+        for instruction in instructions:
+            if instruction[0] == CALL:
+                _wrap(code, [instruction], _call_name(instruction))
+            else:
+                code.append(instruction)
+
+    elif type(ast) is dict:
+        scope, body_ast = list(ast.items())[0]
+
+        code.append((ENTER, _constant(scope), _NO_ARGS, _NO_KWARGS))
+        _lower_named(body_ast, code, "scope")
+        code.append((EXIT, None, _NO_ARGS, _NO_KWARGS))
+
+    else:
+        elements = list(ast)
+
+        if len(elements) == 1:
+            return _lower_named(elements[0], code, name)
+
+        for i, element_ast in enumerate(elements):
+            _lower_named(element_ast, code, "step_{0}".format(i))
+
+    if name is not None and len(code) > start:
+        code[start:] = _wrap([], code[start:], name)
+
+def _wrap(code, instructions, name):
+    code.append((ENTER, _NameScope(name), _NO_ARGS, _NO_KWARGS))
+    code.extend(instructions)
+    code.append((EXIT, None, _NO_ARGS, _NO_KWARGS))
+    return code
+
+def _call_name(instruction):
+    op, fn, args, kwargs = instruction
+
+    if fn is call_method:
+        name = args[0]
+    else:
+        name = getattr(fn, "__name__", None) or type(fn).__name__
+
+    return _INVALID_SCOPE_CHARACTERS.sub("_", name).strip("_") or "call"
+
+class _NameScope(object):
+    "Factory of the name scopes created by `compile(ast, name_scopes=True)`"
+
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __call__(self):
+        return tf.name_scope(self.name)
+
+    # compared by name so `run_incremental` recognizes the scopes of separately compiled programs
+    def __eq__(self, other):
+        return type(other) is _NameScope and other.name == self.name
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((_NameScope, self.name))
+
+_INVALID_SCOPE_CHARACTERS = re.compile(r"[^A-Za-z0-9_.\-]")
+
+def _key(ast, leaves):
+    # leaves are kept alive by the cache so their ids can't be reused while their entry exists
+    if type(ast) is list:
+        return (BRANCH,) + tuple(_key(branch_ast, leaves) for branch_ast in ast)
+
+    elif hasattr(ast, '__call__'):
+        leaves.append(ast)
+        return id(ast)
+
+    elif type(ast) is dict:
+        scope, body_ast = list(ast.items())[0]
+        leaves.append(scope)
+        return (ENTER, id(scope), _key(body_ast, leaves))
+
+    elif type(ast) is tuple:
+        return (CALL,) + tuple(_key(element_ast, leaves) for element_ast in ast)
+
+    else:
+        # generators and other iterables can only be walked once, raised before consuming them
+        raise _NotMaterialized()
+
+def _materialize(ast):
+    "Returns `ast` with the iterables that aren't tuples, lists or dicts (e.g. generators) turned into tuples so it can be walked by `_key` and then by `compile`"
+    if type(ast) is list:
+        return [ _materialize(branch_ast) for branch_ast in ast ]
+
+    elif hasattr(ast, '__call__'):
+        return ast
+
+    elif type(ast) is dict:
+        scope, body_ast = list(ast.items())[0]
+        return {scope: _materialize(body_ast)}
+
+    else:
+        return tuple( _materialize(element_ast) for element_ast in ast )
+
+class _NotMaterialized(Exception):
+    pass
+
+def _program(fn):
+    if isinstance(fn, Program):
+        return fn
+
+    if isinstance(fn, applicative.ApplicativeBase) and isinstance(fn.f, Program):
+        return fn.f
+
+    return None
+
+def _constant(value):
+    return lambda: value
+
+def _unwind(stack, exc_info):
+    while stack:
+        frame = stack.pop()
+
+        if type(frame) is not tuple:
+            frame.__exit__(*exc_info)
+
+
+class _Cache(object):
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ast, name_scopes=False):
+        if self.maxsize <= 0:
+            return compile(ast, name_scopes)
+
+        leaves = []
+
+        try:
+            key = (name_scopes, _key(ast, leaves))
+        except _NotMaterialized:
+            ast = _materialize(ast)
+            leaves = []
+            key = (name_scopes, _key(ast, leaves))
+
+        with self.lock:
+            entry = self.entries.pop(key, None)
+
+            if entry is not None:
+                self.hits += 1
+                self.entries[key] = entry
+                return entry[0]
+
+            self.misses += 1
+
+        program = compile(ast, name_scopes)
+
+        with self.lock:
+            self.entries[key] = (program, leaves)
+            self._evict()
+
+        return program
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.entries))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def resize(self, maxsize):
+        with self.lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def _evict(self):
+        while len(self.entries) > max(self.maxsize, 0):
+            self.entries.popitem(last=False)
+
+_cache = _Cache(int(os.environ.get("TENSORBUILDER_COMPILE_CACHE", "256")))
@@ -0,0 +1,240 @@
+"""
+Deferred graph construction. A Builder created with `tb.build(tensor, lazy=True)` doesn't create ops: `map`, `reduce`, `extract` and the methods built on them record `Node`s of a plan (a DAG whose leaves wrap the input tensors) and the ops are only created when `tensor()` or `tensors()` is called. Before materializing:
+
+* Only the nodes the requested outputs depend on are materialized, branches that are never consumed don't create ops.
+* The registered passes (see `register_pass`) rewrite the nodes, e.g. the tensorflow patch collapses consecutive idempotent elementwise maps like `relu(relu(x))` and fuses the per-branch `fully_connected` layers of `BuilderTree.fully_connected` into a single one.
+
+Scopes entered by the DSL or `Builder.then_with` on a lazy builder are recorded instead of entered, nodes remember the scopes they were created in and materialization enters them around the creation of their ops. Nodes are materialized in creation order so every scope is entered once per materialization, a scope given as a context manager object (like the keys of DSL dicts) can't be entered again, so outputs that depend on the same such scope must be materialized together (e.g. with `tensors()`).
+"""
+
+import sys
+import itertools
+import threading
+
+class _State(threading.local):
+
+    def __init__(self):
+        self.scopes = ()
+
+state = _State()
+
+_counter = itertools.count()
+_passes = []
+
+class Node(object):
+    """
+    An operation of a plan.
+
+    * `kind`: `"source"`, `"map"`, `"reduce"`, `"extract"` or a kind created by a pass.
+    * `fn`, `args`, `kwargs`: the recorded call, for `"reduce"` `fn` is the binary function and `kwargs` contains `initializer` and `balanced`.
+    * `inputs`: the input nodes.
+    * `compute`: a function `list( value ) -> value` that creates the ops given the values of the inputs.
+    * `scopes`: the recorded scopes active when the node was created.
+    * `consumers`: the number of nodes that take this node as an input.
+    """
+
+    __slots__ = ("index", "kind", "fn", "args", "kwargs", "inputs", "compute", "scopes", "consumers", "value", "done", "forward")
+
+    def __init__(self, kind, inputs, fn=None, args=(), kwargs=None, compute=None, scopes=None, index=None):
+        self.index = next(_counter) if index is None else index
+        self.kind = kind
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs if kwargs is not None else {}
+        self.inputs = [ _node(x) for x in inputs ]
+        self.compute = compute
+        self.scopes = state.scopes if scopes is None else scopes
+        self.consumers = 0
+        self.value = None
+        self.done = False
+        self.forward = None
+
+        for node in self.inputs:
+            node.consumers += 1
+
+    def __repr__(self):
+        return "Node({0}, {1}, {2})".format(self.index, self.kind, getattr(self.fn, "__name__", self.fn))
+
+class Scope(object):
+    """
+    A scope recorded on a lazy builder. `factory` returns the context manager, if `reusable` is `False` it always returns the same object and can only be entered once.
+    """
+
+    __slots__ = ("factory", "reusable", "used", "outer")
+
+    def __init__(self, factory, reusable=False):
+        self.factory = factory
+        self.reusable = reusable
+        self.used = False
+
+    def __enter__(self):
+        self.outer = state.scopes
+        state.scopes = self.outer + (self,)
+        return self
+
+    def __exit__(self, *exc_info):
+        state.scopes = self.outer
+
+    def open(self):
+        if self.used and not self.reusable:
+            raise ValueError("A scope of the plan was already materialized and can't be entered again, materialize the outputs that depend on it together or record it with `then_with`.")
+
+        self.used = True
+        scope = self.factory()
+        scope.__enter__()
+        return scope
+
+
+def source(value):
+    """
+    Returns a `Node` that wraps `value`.
+    """
+    node = Node("source", [])
+    node.value = value
+    node.done = True
+    return node
+
+def is_lazy(value):
+    """
+    Whether `value` is a `Node`, a Builder that wraps a `Node` or a BuilderTree with a lazy leaf.
+    """
+    if type(value) is Node:
+        return True
+
+    tensor = getattr(value, "_tensor", None)
+
+    if tensor is not None:
+        return type(tensor) is Node
+
+    return any_lazy( builder._tensor for builder in getattr(value, "_leaves", ()) )
+
+def any_lazy(values):
+    for value in values:
+        if type(value) is Node:
+            return True
+
+    return False
+
+def record_map(value, fn, args, kwargs):
+    return Node("map", [value], fn, args, kwargs, _map_compute(fn, args, kwargs))
+
+def record_reduce(values, fn, reducer, initializer=None, balanced=None):
+    "`reducer` is a function `list( Tensor ) -> Tensor` that does the actual reduction"
+    return Node("reduce", values, fn, (), dict(initializer=initializer, balanced=balanced), reducer)
+
+def record_extract(values, fn, args, kwargs):
+    return Node("extract", values, fn, args, kwargs, lambda values: fn(values, *args, **kwargs))
+
+def register_pass(optimization):
+    """
+    Registers an optimization pass. `optimization` is a function `Node -> Node | None` called on each node that is about to be materialized (its inputs were already optimized), if it returns a new node it replaces the original one.
+    """
+    if optimization not in _passes:
+        _passes.append(optimization)
+
+def materialize(values):
+    """
+    Creates the ops of the `Node`s in `values` and the nodes they depend on, returns a list with the resulting value of each element, elements that are not nodes are returned as they are.
+    """
+    outputs = [ _optimize(_resolve(value)) if type(value) is Node else value for value in values ]
+    nodes = _pending([ node for node in outputs if type(node) is Node ])
+
+    if nodes:
+        _run(nodes)
+
+    return [ node.value if type(node) is Node else node for node in outputs ]
+
+
+def _node(value):
+    return value if type(value) is Node else source(value)
+
+def _map_compute(fn, args, kwargs):
+    return lambda values: fn(values[0], *args, **kwargs)
+
+def _resolve(node):
+    while node.forward is not None:
+        node = node.forward
+
+    return node
+
+def _pending(outputs):
+    "The nodes that aren't materialized and the outputs depend on, in creation order"
+    seen = set()
+    nodes = []
+    stack = list(outputs)
+
+    while stack:
+        node = stack.pop()
+
+        if node.done or id(node) in seen:
+            continue
+
+        seen.add(id(node))
+        nodes.append(node)
+        stack.extend(node.inputs)
+
+    nodes.sort(key=lambda node: node.index)
+    return nodes
+
+def _optimize(output):
+    for node in _pending([output]):
+        node.inputs = [ _resolve(x) for x in node.inputs ]
+
+        for optimization in _passes:
+            replacement = optimization(node)
+
+            if replacement is not None and replacement is not node:
+                node.forward = replacement
+                node = replacement
+
+    return _resolve(output)
+
+def _run(nodes):
+    graph = _graph(nodes)
+
+    if graph is None:
+        return _run_nodes(nodes)
+
+    with graph.as_default():
+        return _run_nodes(nodes)
+
+def _graph(nodes):
+    "The graph of the tensors the plan starts from"
+    for node in nodes:
+        for x in node.inputs:
+            if x.done and hasattr(x.value, "graph"):
+                return x.value.graph
+
+def _run_nodes(nodes):
+    # entered[i] is the context manager of the recorded scope opened[i]
+    opened = []
+    entered = []
+
+    try:
+        for node in nodes:
+            scopes = node.scopes
+            common = 0
+
+            while common < len(opened) and common < len(scopes) and opened[common] is scopes[common]:
+                common += 1
+
+            while len(opened) > common:
+                opened.pop()
+                entered.pop().__exit__(None, None, None)
+
+            for scope in scopes[common:]:
+                entered.append(scope.open())
+                opened.append(scope)
+
+            node.value = node.compute([ x.value for x in node.inputs ])
+            node.done = True
+
+        exc_info = (None, None, None)
+    except:
+        exc_info = sys.exc_info()
+
+    while entered:
+        entered.pop().__exit__(*exc_info)
+
+    if exc_info[0] is not None:
+        raise exc_info[0], exc_info[1], exc_info[2]
@@ -0,0 +1,209 @@
+"""
+Profiler of graph construction. While a `Profile` is active the methods generated by the `register_*` methods (every method set with `tensorbuilder.core.utils.set_method`, including the ones created lazily while profiling), `ApplicativeBase.compose`, the compilation of the DSL and `BuilderTree.reduce` / `BuilderTree.map_each` are replaced by wrappers that record for each of them:
+
+* `calls`: the number of calls.
+* `time`: the cumulative wall time in seconds, recursive calls of the same method are included in the time of the outermost one.
+* `ops`: the number of ops created in the graph of the input (or the default graph), with the same rule as `time`.
+
+The original methods are restored when the last active `Profile` exits, so profiling has no cost when its not used.
+"""
+
+import sys
+import json
+import time
+import functools
+import threading
+import utils
+import applicative
+import builders
+import tensorflow as tf
+
+class _State(threading.local):
+
+    def __init__(self):
+        self.active = set()
+
+state = _State()
+
+_lock = threading.Lock()
+_profiles = []
+# (owner, name, original, wrappers) of the instrumented attributes
+_instrumented = []
+
+_SORT_KEYS = ("time", "calls", "ops", "name")
+
+class Profile(object):
+    """
+    Context manager that records the graph construction time of the methods of TensorBuilder, see `tensorbuilder.core.profiler`.
+
+    **Arguments**
+
+    * `verbose`: whether to write a text report on exit. (default: `True`)
+    * `stream`: the file where the text report is written, `None` means `sys.stderr`.
+    * `json_path`: an optional path where the JSON report is written on exit.
+    * `sort`: the column the reports are sorted by, one of `"time"`, `"calls"`, `"ops"` or `"name"`. (default: `"time"`)
+    """
+
+    def __init__(self, verbose=True, stream=None, json_path=None, sort="time"):
+        if sort not in _SORT_KEYS:
+            raise ValueError("sort must be one of {0}, got {1}".format(_SORT_KEYS, sort))
+
+        self.verbose = verbose
+        self.stream = stream
+        self.json_path = json_path
+        self.sort = sort
+        self.stats = {}
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        with _lock:
+            if not _profiles:
+                _install()
+
+            _profiles.append(self)
+
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed += time.time() - self.start
+
+        with _lock:
+            _profiles.remove(self)
+
+            if not _profiles:
+                _uninstall()
+
+        if self.verbose:
+            (self.stream or sys.stderr).write(self.format())
+
+        if self.json_path is not None:
+            with open(self.json_path, "w") as f:
+                f.write(self.to_json())
+
+    def record(self, name, seconds, ops):
+        entry = self.stats.get(name)
+
+        if entry is None:
+            entry = self.stats[name] = [0, 0.0, 0]
+
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += ops
+
+    def report(self, sort=None):
+        """
+        Returns a list with a dict per method with its `name`, `calls`, `time` and `ops`, sorted by `sort` (default: the `sort` of the profile) in descending order, or ascending for `"name"`.
+        """
+        sort = sort or self.sort
+        rows = [ dict(name=name, calls=calls, time=seconds, ops=ops) for name, (calls, seconds, ops) in self.stats.items() ]
+        rows.sort(key=lambda row: row["name"])
+
+        if sort != "name":
+            rows.sort(key=lambda row: row[sort], reverse=True)
+
+        return rows
+
+    def to_json(self):
+        """
+        Returns the report as a JSON string `{"elapsed": seconds, "methods": report}`.
+        """
+        return json.dumps(dict(elapsed=self.elapsed, methods=self.report()), indent=2, sort_keys=True)
+
+    def format(self):
+        """
+        Returns the report as a text table.
+        """
+        lines = ["TensorBuilder profile: {0:.4f}s".format(self.elapsed), "{0:>10} {1:>12} {2:>10}  {3}".format("calls", "time (s)", "ops", "method")]
+
+        for row in self.report():
+            lines.append("{calls:>10} {time:>12.6f} {ops:>10}  {name}".format(**row))
+
+        return "\n".join(lines) + "\n"
+
+
+def _install():
+    for cls, names in list(utils.generated_methods.items()):
+        for name in names:
+            _instrument(cls, name, "{0}.{1}".format(cls.__name__, name))
+
+    _instrument(applicative.ApplicativeBase, "compose", "compose")
+    _instrument(applicative, "_compile", "compile")
+    _instrument(builders.BuilderTreeBase, "reduce", "BuilderTree.reduce")
+    _instrument(builders.BuilderTreeBase, "map_each", "BuilderTree.map_each")
+
+    utils.set_method_hooks.append(_on_set_method)
+
+def _uninstall():
+    utils.set_method_hooks.remove(_on_set_method)
+
+    while _instrumented:
+        owner, name, original, wrappers = _instrumented.pop()
+
+        # leave methods that were replaced while profiling
+        if any( vars(owner).get(name) is wrapper for wrapper in wrappers ):
+            setattr(owner, name, original)
+
+def _on_set_method(cls, name):
+    _instrument(cls, name, "{0}.{1}".format(cls.__name__, name))
+
+def _instrument(owner, name, label):
+    original = vars(owner).get(name)
+
+    if isinstance(original, utils.LazyDocMethod):
+        # the documentation is rendered by the wrapper only if its read, the original descriptor is restored on exit
+        wrapper = _wrap(original.fn, label)
+        installed = utils.LazyDocMethod(owner, name, wrapper, original.doc)
+        _instrumented.append((owner, name, original, (installed, wrapper)))
+        setattr(owner, name, installed)
+        return
+
+    if not callable(original) or isinstance(original, type):
+        return
+
+    wrapper = _wrap(original, label)
+    _instrumented.append((owner, name, original, (wrapper,)))
+    setattr(owner, name, wrapper)
+
+def _wrap(fn, label):
+    @functools.wraps(fn)
+    def _profiled(*args, **kwargs):
+        active = state.active
+
+        if label in active:
+            _record(label, 0.0, 0)
+            return fn(*args, **kwargs)
+
+        graph = _graph(args)
+        version = graph.version
+        active.add(label)
+        start = time.time()
+
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            seconds = time.time() - start
+            active.discard(label)
+            _record(label, seconds, graph.version - version)
+
+    return _profiled
+
+def _record(label, seconds, ops):
+    for profile in _profiles:
+        profile.record(label, seconds, ops)
+
+def _graph(args):
+    "The graph of the Builder or BuilderTree the method is called on, or the default graph"
+    if args:
+        tensor = getattr(args[0], "_tensor", None)
+
+        if tensor is None:
+            leaves = getattr(args[0], "_leaves", None)
+            tensor = leaves[0]._tensor if leaves else None
+
+        graph = getattr(tensor, "graph", None)
+
+        if graph is not None:
+            return graph
+
+    return tf.get_default_graph()
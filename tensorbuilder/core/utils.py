@@ -1,9 +1,192 @@
 from collections import namedtuple
-import functools, inspect
+import functools, inspect, weakref
 from decorator import decorator
+from abc import ABCMeta
 
 
 
+# Lazy methods
+class LazyMethods(ABCMeta):
+    """
+    Metaclass of the core classes. Besides being an `ABCMeta` it lets patches register methods that are only created the first time they are looked up, this way importing TensorBuilder doesn't have to build (and document) every method of every patch.
+
+    There are two ways to register a lazy method:
+
+    * `register_lazy_method(name, factory)`: `factory` is a function with no arguments.
+    * `register_lazy_resolver(resolver)`: `resolver` is a function of type `name -> factory | None`, useful when the names are not known in advance.
+
+    The factory is expected to register the method on the class (e.g. through `register_map_method`), after that the method is cached on the class and the next lookups are plain attribute accesses.
+    """
+
+    def __getattr__(cls, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        for klass in cls.__mro__:
+            factory = _lazy_factory(klass, name)
+
+            if factory:
+                factory()
+                klass.__dict__.get('_lazy_methods', {}).pop(name, None)
+                return type.__getattribute__(cls, name)
+
+        raise AttributeError("type object '{0}' has no attribute '{1}'".format(cls.__name__, name))
+
+    def register_lazy_method(cls, name, factory):
+        if '_lazy_methods' not in cls.__dict__:
+            cls._lazy_methods = {}
+
+        cls._lazy_methods[name] = factory
+
+    def register_lazy_resolver(cls, resolver):
+        if '_lazy_resolvers' not in cls.__dict__:
+            cls._lazy_resolvers = []
+
+        cls._lazy_resolvers.append(resolver)
+
+    def lazy_method_names(cls):
+        """Returns the names registered with `register_lazy_method` that haven't been created yet"""
+        return [ name for klass in cls.__mro__ for name in klass.__dict__.get('_lazy_methods', ()) ]
+
+
+def lazy_getattr(self, name):
+    """
+    Instance counterpart of `LazyMethods.__getattr__`, classes using the `LazyMethods` metaclass set it as their `__getattr__`.
+    """
+    if name.startswith('_'):
+        raise AttributeError(name)
+
+    getattr(type(self), name)
+    return object.__getattribute__(self, name)
+
+
+def _lazy_factory(klass, name):
+    factories = klass.__dict__.get('_lazy_methods')
+
+    if factories and name in factories:
+        return factories[name]
+
+    for resolver in klass.__dict__.get('_lazy_resolvers', ()):
+        factory = resolver(name)
+
+        if factory:
+            return factory
+
+
+# Lazy docs
+class LazyDoc(object):
+    """
+    A docstring that is only rendered when its read. It stores a function `render` plus the arguments it should be called with, the `register_*` methods accept it as their `doc` argument and use it by default so generating the documentation of the (many) patched methods doesn't slow down the registration.
+    """
+    __slots__ = ("_render", "_args")
+
+    def __init__(self, render, *args):
+        self._render = render
+        self._args = args
+
+    def render(self):
+        return self._render(*self._args)
+
+
+class LazyDocMethod(object):
+    """
+    Descriptor placed on a class by `set_method` when the documentation is a `LazyDoc`. On the first lookup it renders the documentation into the function and replaces itself with the plain function, so only the first access pays for it.
+    """
+    __slots__ = ("cls", "name", "fn", "doc")
+
+    def __init__(self, cls, name, fn, doc):
+        self.cls = cls
+        self.name = name
+        self.fn = fn
+        self.doc = doc
+
+    def __get__(self, instance, owner):
+        return self.materialize().__get__(instance, owner)
+
+    def materialize(self):
+        fn = self.fn
+
+        if self.doc is not None:
+            fn.__doc__ = self.doc.render()
+            self.doc = None
+
+        if self.cls.__dict__.get(self.name) is self:
+            setattr(self.cls, self.name, fn)
+
+        return fn
+
+
+def method_docs(template, original_name, library_path, name, fn):
+    """
+    Returns a `LazyDoc` that renders `template(original_name, library_path, name, fn_signature, fn_docs)` where `fn_signature` and `fn_docs` are taken from `fn`. The original documentation of `fn` is captured now since registering `fn` will overwrite it.
+    """
+    return LazyDoc(_render_method_docs, template, original_name, library_path, name, fn, fn.__doc__)
+
+def _render_method_docs(template, original_name, library_path, name, fn, fn_docs):
+    fn_signature = get_method_sig(fn, original_name)
+    fn_docs = inspect.cleandoc(fn_docs) if isinstance(fn_docs, basestring) else None
+
+    return template(original_name, library_path, name, fn_signature, fn_docs)
+
+
+# cls -> set of the names of the methods set with `set_method`, classes are weakly referenced so patched classes that are no longer used are dropped; and functions `(cls, name) -> None` called after a method is set
+generated_methods = weakref.WeakKeyDictionary()
+set_method_hooks = []
+
+def set_method(cls, name, fn, doc):
+    """
+    Sets `fn` as the method `name` of `cls`, `doc` can be a string or a `LazyDoc`. The name is recorded in `generated_methods[cls]` and the `set_method_hooks` are called with `cls` and `name` (see `tensorbuilder.core.profiler`).
+    """
+    if isinstance(doc, LazyDoc):
+        setattr(cls, name, LazyDocMethod(cls, name, fn, doc))
+    else:
+        fn.__doc__ = doc
+        setattr(cls, name, fn)
+
+    names = generated_methods.get(cls)
+
+    if names is None:
+        names = generated_methods[cls] = set()
+
+    names.add(name)
+
+    for hook in set_method_hooks:
+        hook(cls, name)
+
+
+def balanced_reduce(fn, xs):
+    """
+    Reduces `xs` with the associative function `fn` as a balanced binary tree, e.g. `[a, b, c, d]` is reduced as `fn(fn(a, b), fn(c, d))`. The order of the elements is preserved so `fn` doesn't have to be commutative.
+    """
+    xs = list(xs)
+
+    if not xs:
+        raise TypeError("reduce() of empty sequence with no initial value")
+
+    while len(xs) > 1:
+        pairs = [ fn(xs[i], xs[i + 1]) for i in range(0, len(xs) - 1, 2) ]
+
+        if len(xs) % 2:
+            pairs.append(xs[-1])
+
+        xs = pairs
+
+    return xs[0]
+
+
+def freeze(args, kwargs):
+    """
+    Returns a hashable representation of the arguments of a call, values are paired with their type so `1`, `1.0` and `True` are different arguments. Raises `TypeError` if an argument is not hashable.
+    """
+    frozen = (
+        tuple( (type(value), value) for value in args ),
+        tuple( (name, type(value), value) for name, value in sorted(kwargs.items()) )
+    )
+    hash(frozen)
+
+    return frozen
+
+
 # Decorators
 @decorator
 def immutable(method, self, *args, **kwargs):
@@ -41,11 +224,12 @@ def _get_default_arg(args, defaults, arg_index):
             value = '"%s"' % value
         return DefaultArgSpec(True, value)
 
-def get_method_sig(method):
+def get_method_sig(method, name=None):
     """ Given a function, it returns a string that pretty much looks how the
     function signature_ would be written in python.
 
     :param method: a python method
+    :param name: the name to use instead of `method.__name__`
     :return: A string similar describing the pythong method signature_.
     eg: "my_method(first_argArg, second_arg=42, third_arg='something')"
     """
@@ -54,7 +238,11 @@ def get_method_sig(method):
     # list of defaults are returned in separate array.
     # eg: ArgSpec(args=['first_arg', 'second_arg', 'third_arg'],
     # varargs=None, keywords=None, defaults=(42, 'something'))
-    argspec = inspect.getargspec(method)
+    if inspect.isclass(method):
+        argspec = inspect.getargspec(method.__init__)
+        argspec = argspec._replace(args=argspec.args[1:])
+    else:
+        argspec = inspect.getargspec(method)
     arg_index=0
     args = []
 
@@ -67,7 +255,21 @@ def get_method_sig(method):
         else:
             args.append(arg)
         arg_index += 1
-    return "%s(%s)" % (method.__name__, ", ".join(args))
+    return "%s(%s)" % (name or method.__name__, ", ".join(args))
+
+def get_method_names(cls):
+    """
+    Returns the names of the methods of `cls` like `inspect.getmembers(cls, inspect.ismethod)` would, but without rendering the documentation of the methods that still have a `LazyDoc`.
+    """
+    names = []
+
+    for name in dir(cls):
+        raw = next(( klass.__dict__[name] for klass in cls.__mro__ if name in klass.__dict__ ), None)
+
+        if isinstance(raw, LazyDocMethod) or inspect.ismethod(getattr(cls, name, None)):
+            names.append(name)
+
+    return names
 
 def get_instance_methods(instance):
     for method_name in dir(instance):
@@ -1,12 +1,65 @@
-
+import os
 from tensorbuilder.core import concrete_classes
 from tensorbuilder import core
+import manifest
 
 def class_patcher(patch):
     classes = concrete_classes.get(core.BuilderBase, core.BuilderTreeBase, core.ApplicativeBase)
     patch(*classes)
     return classes
 
-def patched_tensorbuilder_classes():
+def patched_tensorbuilder_classes(eager=None, use_manifest=None):
+    """
+    Creates the Builder, BuilderTree and Applicative classes with the methods of `tensorbuilder.extensions.patches.tensorbuilder_patch`. By default methods are created lazily the first time they are used, pass `eager=True` or set the environment variable `TENSORBUILDER_EAGER=1` to register them all upfront (needed to generate the documentation).
+
+    If `use_manifest` is `True` the registered methods are taken from the cached `tensorbuilder.extensions.manifest` instead of reflecting over TensorFlow, the manifest is built on the first use. It defaults to the environment variable `TENSORBUILDER_MANIFEST`, which is on by default only for eager patching since lazy patching doesn't reflect anyway.
+    """
+    from patches.tensorbuilder_patch import patch_classes, lazy_patch_classes, apply_manifest
+
+    if eager is None:
+        eager = os.environ.get("TENSORBUILDER_EAGER", "0") == "1"
+
+    if use_manifest is None:
+        use_manifest = os.environ.get("TENSORBUILDER_MANIFEST", "1" if eager else "0") == "1"
+
+    entries = load_manifest() if use_manifest else None
+
+    if entries is None:
+        return class_patcher(patch_classes if eager else lazy_patch_classes)
+
+    return class_patcher(lambda *classes: apply_manifest(entries, *classes, lazy=not eager))
+
+def load_manifest():
+    """
+    Returns the entries of the cached manifest, building it if there isn't one for the installed versions of TensorBuilder, TensorFlow and tflearn. If the manifest can't be written the entries that were just built are returned anyway.
+    """
+    entries = manifest.load()
+
+    if entries is None:
+        entries = build_manifest()
+
+        try:
+            manifest.save(entries)
+        except (IOError, OSError):
+            pass
+
+    return entries
+
+def build_manifest():
+    """
+    Reflects over TensorFlow and returns the manifest entries of `tensorbuilder.extensions.patches.tensorbuilder_patch` without writing them.
+    """
     from patches.tensorbuilder_patch import patch_classes
-    return class_patcher(patch_classes)
+
+    entries = []
+    class_patcher(lambda *classes: patch_classes(*classes, manifest=entries))
+
+    return entries
+
+def rebuild_manifest():
+    """
+    Reflects over TensorFlow to build the manifest of `tensorbuilder.extensions.patches.tensorbuilder_patch` and writes it to the cache, returns a tuple `(path, entries)`.
+    """
+    entries = build_manifest()
+
+    return manifest.save(entries), entries
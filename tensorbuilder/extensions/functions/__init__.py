@@ -0,0 +1,3 @@
+"""
+TensorFlow functions defined by TensorBuilder, they are registered as Builder methods by `tensorbuilder.extensions.patches.tensorbuilder_patch`.
+"""
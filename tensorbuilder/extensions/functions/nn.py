@@ -1,8 +1,40 @@
+import numpy as np
 import tensorflow as tf
 
-def polynomic(name=None):
-	def _polynomic(tensor):
-	    size = m = int(tensor.get_shape()[1])
-	    pows = map(lambda n: tf.pow(tensor[:, n], n + 1), range(size))
-    	return tf.transpose(tf.pack(pows), name=name)
-  	return polynomic
+def polynomic(tensor, degree=None, name=None):
+    """
+    Polynomial feature expansion of a Tensor of shape `[batch, features]` computed with a single broadcasted `tf.pow`.
+
+    * If `degree` is `None` the column `n` is raised to the power `n + 1`, the result has shape `[batch, features]`.
+    * If `degree` is an integer `k` every column is raised to the powers `1, ..., k`, the result has shape `[batch, features * k]` with the powers of each column next to each other.
+
+    **Arguments**
+
+    * `tensor`: a Tensor of rank 2 with a known number of features.
+    * `degree`: the degree of the expansion (default: `None`)
+    * `name`: the name of the resulting Tensor.
+
+    **Return**
+
+    Tensor
+
+    **Examples**
+
+        import tensorflow as tf
+        from tensorbuilder import tb
+
+        x = tf.placeholder(tf.float32, shape=[None, 3])
+
+        h = tb.build(x).polynomic(degree=2).tensor() # [x1, x1^2, x2, x2^2, x3, x3^2]
+    """
+    dtype = tensor.dtype.base_dtype.as_numpy_dtype
+    size = int(tensor.get_shape()[1])
+
+    if degree is None:
+        exponents = tf.constant(np.arange(1, size + 1, dtype=dtype))
+        return tf.pow(tensor, exponents, name=name)
+
+    exponents = tf.constant(np.arange(1, degree + 1, dtype=dtype))
+    pows = tf.pow(tf.expand_dims(tensor, 2), exponents)
+
+    return tf.reshape(pows, [-1, size * degree], name=name)
@@ -0,0 +1,95 @@
+"""
+Cache of the methods registered by `tensorbuilder.extensions.patches.tensorbuilder_patch.patch_classes`. Registering them eagerly requires reflecting over `tf`, `tf.nn`, `tf.contrib.layers` and `tflearn`, the manifest stores the result of that reflection (a list of entries with the name of each method, the module it comes from and its kind) so later imports can skip it.
+
+The manifest is stored as JSON in `TENSORBUILDER_CACHE_DIR` (default `~/.cache/tensorbuilder`) in a file keyed by the versions of TensorBuilder, TensorFlow and tflearn, a manifest whose versions don't match the installed ones is ignored and rebuilt.
+"""
+
+import os
+import sys
+import imp
+import json
+import hashlib
+import tempfile
+
+
+def cache_dir():
+    return os.environ.get("TENSORBUILDER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "tensorbuilder"))
+
+def versions():
+    """
+    Returns the versions the manifest depends on. tflearn is not imported to find its version.
+    """
+    import tensorflow as tf
+    import tensorbuilder
+
+    return {
+        "tensorbuilder": tensorbuilder.__version__.strip(),
+        "tensorflow": tf.__version__,
+        "tflearn": _distribution_version("tflearn")
+    }
+
+def path(_versions=None):
+    _versions = _versions if _versions else versions()
+    key = hashlib.md5(json.dumps(_versions, sort_keys=True)).hexdigest()[:16]
+
+    return os.path.join(cache_dir(), "manifest-{0}.json".format(key))
+
+def load():
+    """
+    Returns the entries of the cached manifest or `None` if there is no manifest for the installed versions.
+    """
+    _versions = versions()
+
+    try:
+        with open(path(_versions)) as f:
+            manifest = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if manifest.get("versions") != _versions:
+        return None
+
+    # json returns unicode strings, but function names have to be `str`
+    return [ { str(k): v if v is None else str(v) for k, v in entry.items() } for entry in manifest["entries"] ]
+
+def save(entries):
+    """
+    Writes `entries` as the manifest for the installed versions and returns the path of the file.
+    """
+    _versions = versions()
+    filename = path(_versions)
+    directory = os.path.dirname(filename)
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    fd, tmp = tempfile.mkstemp(dir=directory)
+
+    with os.fdopen(fd, "w") as f:
+        json.dump({"versions": _versions, "entries": entries}, f)
+
+    os.rename(tmp, filename)
+
+    return filename
+
+
+def _distribution_version(name):
+    module = sys.modules.get(name)
+
+    if hasattr(module, "__version__"):
+        return module.__version__
+
+    try:
+        _, package_path, _ = imp.find_module(name)
+    except ImportError:
+        return None
+
+    site = os.path.dirname(package_path)
+
+    for filename in os.listdir(site):
+        base, ext = os.path.splitext(filename)
+
+        if ext in (".dist-info", ".egg-info") and base.startswith(name + "-"):
+            return base[len(name) + 1:].split("-")[0]
+
+    return "mtime-{0}".format(int(os.path.getmtime(package_path)))
@@ -1,250 +1,595 @@
 import tensorflow as tf
 from tensorbuilder.core.builders import BuilderBase, BuilderTreeBase
 from tensorbuilder.core.applicative import ApplicativeBase
-from tensorbuilder.core import utils
-import numpy as np
-import tflearn as tl
+from tensorbuilder.core import utils, plan, dsl, cost
+from tensorbuilder.extensions import manifest
 import inspect
+import importlib
+
+
+scope_functions = ["variable_scope", "device"]
+builders_blacklist = (
+    ["relu_layer"] +
+    scope_functions +
+    BuilderBase.__core__ + BuilderTreeBase.__core__
+)
+applicative_builder_blacklist = (
+    ["copy", "compose"] +
+    scope_functions +
+    ApplicativeBase.__core__ +
+    [ "with_" + v for v in scope_functions ]
+)
+applicative_tree_blacklist = (
+    ["copy", "connect_layer", "compose"] +
+    scope_functions +
+    ApplicativeBase.__core__ +
+    [ "with_" + v for v in scope_functions ]
+)
+
+
+def patch_classes(Builder, BuilderTree, Applicative, manifest=None):
+    """
+    Eagerly registers all the methods of this patch, it reflects over `tf` and `tf.nn` and clones every Builder and BuilderTree method onto the Applicative. Its slow but it gives classes with a complete `__dict__`, which is what the documentation needs.
+
+    If `manifest` is a list, an entry describing each registered method is appended to it (see `tensorbuilder.extensions.manifest`) so `apply_manifest` can later repeat the registration without the reflection.
+    """
+    classes = dict(Builder=Builder, BuilderTree=BuilderTree, Applicative=Applicative)
+
+    register_reductions(BuilderTree)
+    register_plan_passes()
+    register_estimators()
 
+    ###############################
+    # tf + tf.nn
+    ###############################
 
-def patch_classes(Builder, BuilderTree, Applicative):
+    entries = _static_entries()[:3]
 
-    scope_functions = ["variable_scope", "device"]
-    builders_blacklist = (
-        ["relu_layer"] +
-        scope_functions +
-        BuilderBase.__core__ + BuilderTreeBase.__core__
-    )
-    applicative_builder_blacklist = (
-        ["copy", "compose"] +
-        scope_functions +
-        ApplicativeBase.__core__ +
-        [ "with_" + v for v in scope_functions ]
-    )
-    applicative_tree_blacklist = (
-        ["copy", "connect_layer", "compose"] +
-        scope_functions +
-        ApplicativeBase.__core__ +
-        [ "with_" + v for v in scope_functions ]
-    )
+    for _name, f, _module_name in _tf_members():
+        _module = "tensorflow" + _module_name[2:]
 
-    ###############################
-    #### TREE
-    ###############################
-    def _tree_fully_connected(tree, size, *args, **kwargs):
-        """
-        Reduces all leaf nodes of a to a single layer. To do this, it first creates a `fully_connected` linear layer of size `size` for each leaf node, then it adds all these together to create a single layer. At this point if `activation_fn` is defined it applies it to this sum.
+        # private names (e.g. `_floor_div`, the `__name__` of `tf.floordiv`) can't be looked up lazily
+        if not f.__name__.startswith("_"):
+            entries.append(_entry("Builder", f.__name__, "map", _module, _name, _module_name)) #This should go first
 
-        > **Note:** This function behaves slightly different to `tf.contrib.layers.fully_connected` since that function has `tf.nn.relu` as the default for `activation_fn`, that behavior might be unexpected so we initialize it as `None`.
+        entries += [
+            _entry("Builder", _name + "_layer", "layer", _module, _name, _module_name),
+            _entry("BuilderTree", _name + "_layer", "layer", _module, _name, _module_name)
+        ]
 
-        **Arguments**
+    entries += _static_entries()[3:]
 
-        * `size`: the size of the resulting layer
-        * All other \*args and \*\*kwargs are forwarded to `tf.contrib.layers.fully_connected`
+    for entry in entries:
+        apply_entry(classes, entry)
 
-        **Return**
+    #######################
+    ### clone tb + tr
+    #######################
 
-        Builder
+    _dsl_funs = (
+        [ (BuilderTree, _name) for _name in utils.get_method_names(BuilderTree) if _name[0] != '_' and _name not in applicative_tree_blacklist ] +
+        [ (Builder, _name) for _name in utils.get_method_names(Builder) if _name[0] != '_' and _name not in applicative_builder_blacklist ]
+    )
 
-        **Examples**
-        """
-        activation_fn = None
+    for cls, _name in _dsl_funs:
+        entry = _entry("Applicative", _name, "applicative", None, cls.__name__, cls.__name__)
+        apply_entry(classes, entry)
+        entries.append(entry)
 
-        if "activation_fn" in kwargs:
-            activation_fn = kwargs["activation_fn"]
-            del kwargs["activation_fn"]
+    if manifest is not None:
+        manifest.extend(entries)
 
-        builder = (
-            tree
-            .map_each(tf.contrib.layers.fully_connected, size, *args, **kwargs)
-            .reduce(tf.add)
-        )
 
-        if activation_fn:
-            builder = builder.map(activation_fn)
+def lazy_patch_classes(Builder, BuilderTree, Applicative):
+    """
+    Same methods as `tensorbuilder.extensions.patches.tensorbuilder_patch.patch_classes` but registered through `tensorbuilder.core.utils.LazyMethods`, each method is only created the first time its looked up. Names that come from `tf`/`tf.nn` and the Applicative clones are resolved on their first lookup by looking the name up directly in `tf`/`tf.nn`, so nothing is reflected at import time or when a name doesn't exist. The few map methods whose name isn't the attribute of their function (e.g. `neg` for `tf.negative`) are only found if there is a cached manifest, see `tensorbuilder.extensions.load_manifest`.
+    """
+    classes = dict(Builder=Builder, BuilderTree=BuilderTree, Applicative=Applicative)
 
-        return builder
+    register_reductions(BuilderTree)
+    register_plan_passes()
+    register_estimators()
 
-    BuilderTree.register_method(
-        _tree_fully_connected,
-        "tensorbuilder.patches.tensorflow.fully_connected",
-        alias = "fully_connected",
-        doc = _tree_fully_connected.__doc__
-    )
+    for entry in _static_entries():
+        _register_lazy_entry(classes, entry)
 
     ###############################
-    #### BUILDER
+    #### TREE
     ###############################
+    def _tree_resolver(name):
+        f, module_name = _tf_layer_function(name)
 
-    #fully_connected
-    Builder.register_map_method(tf.contrib.layers.fully_connected, "tf.contrib.layers")
+        if f:
+            return lambda: _register_layer_method(BuilderTree, name[:-len("_layer")], f, module_name)
 
-    #convolution2d
-    Builder.register_map_method(tf.contrib.layers.convolution2d, "tf.contrib.layers")
+    BuilderTree.register_lazy_resolver(_tree_resolver)
 
     ###############################
-    # tf + tf.nn
+    #### BUILDER
     ###############################
+    def _builder_resolver(name):
+        f, module_name = _tf_layer_function(name)
+
+        if f:
+            return lambda: _register_layer_method(Builder, name[:-len("_layer")], f, module_name)
 
-    def _get_layer_method(f):
-        def _layer_method(builder, size, *args, **kwargs):
-            kwargs['activation_fn'] = f
-            return builder.fully_connected(size, *args, **kwargs)
+        f, module_name = _tf_map_function(name)
 
-        return _layer_method
+        if f:
+            return lambda: Builder.register_map_method(f, module_name, alias=name)
 
+    Builder.register_lazy_resolver(_builder_resolver)
 
-    _tf_funs = (
-        [ (name, f, "tf.nn") for (name, f) in inspect.getmembers(tf.nn, inspect.isfunction) if name not in builders_blacklist ] +
-        [ (name, f, "tf") for (name, f) in inspect.getmembers(tf, inspect.isfunction) if name not in builders_blacklist ]
+    ###############################
+    #### APPLICATIVE
+    ###############################
+    def _applicative_resolver(name):
+        for cls, blacklist in [(Builder, applicative_builder_blacklist), (BuilderTree, applicative_tree_blacklist)]:
+            f = getattr(cls, name, None) if name not in blacklist else None
+
+            if inspect.ismethod(f):
+                return lambda: _register_app_method(Applicative, name, cls)
+
+    Applicative.register_lazy_resolver(_applicative_resolver)
+
+
+def apply_manifest(entries, Builder, BuilderTree, Applicative, lazy=False):
+    """
+    Registers the methods described by the manifest `entries` (as produced by `patch_classes`). If `lazy` is `True` they are registered as lazy methods on top of `lazy_patch_classes`, else they are all registered immediately; either way nothing is reflected.
+    """
+    classes = dict(Builder=Builder, BuilderTree=BuilderTree, Applicative=Applicative)
+
+    if lazy:
+        lazy_patch_classes(Builder, BuilderTree, Applicative)
+    else:
+        register_reductions(BuilderTree)
+        register_plan_passes()
+        register_estimators()
+
+    for entry in entries:
+        if lazy:
+            _register_lazy_entry(classes, entry)
+        else:
+            apply_entry(classes, entry)
+
+
+###############################
+#### Manifest entries
+###############################
+
+def _entry(cls_name, name, kind, module, source, library):
+    """
+    Describes a method registered by this patch:
+
+    * `class`: the name of the class that gets the method.
+    * `name`: the name of the method.
+    * `kind`: `map`, `layer`, `scope`, `method` (a function of this module) or `applicative` (a clone of a Builder/BuilderTree method).
+    * `module` + `source`: the import path of the module and the name of the function in it, for `applicative` `source` is the name of the cloned class.
+    * `library`: the path shown in the documentation.
+    """
+    return {"class": cls_name, "name": name, "kind": kind, "module": module, "source": source, "library": library}
+
+def _static_entries():
+    return (
+        [
+            _entry("BuilderTree", "fully_connected", "method", __name__, "_tree_fully_connected", "tensorbuilder.patches.tensorflow.fully_connected"),
+            _entry("Builder", "fully_connected", "map", "tensorflow.contrib.layers", "fully_connected", "tf.contrib.layers"),
+            _entry("Builder", "convolution2d", "map", "tensorflow.contrib.layers", "convolution2d", "tf.contrib.layers"),
+            _entry("Builder", "linear_layer", "method", __name__, "linear_layer", "tensorbuilder"),
+            _entry("BuilderTree", "linear_layer", "method", __name__, "linear_layer", "tensorbuilder"),
+            _entry("Builder", "flatten", "map", "tflearn.layers.core", "flatten", "tflearn.layers.core.flatten")
+        ] +
+        [ _entry("Builder", "with_" + name, "scope", "tensorflow", name, "tf") for name in scope_functions ] +
+        [
+            _entry("Builder", "max_pool_2d", "map", "tflearn.layers.conv", "max_pool_2d", "tflearn.layers"),
+            _entry("Builder", "polynomic", "map", "tensorbuilder.extensions.functions.nn", "polynomic", "tensorbuilder.extensions.functions.nn")
+        ]
     )
 
+def apply_entry(classes, entry):
+    cls = classes[entry["class"]]
+    kind = entry["kind"]
 
-    for _name, f, _module_name in _tf_funs:
-        _layer_name = _name + "_layer"
-        _f_signature = utils.get_method_sig(f)
-        _f_docs = inspect.getdoc(f)
+    if kind == "applicative":
+        return _register_app_method(cls, entry["name"], classes[entry["source"]])
 
-        _layer_method = _get_layer_method(f)
+    f = _resolve(entry["module"], entry["source"])
 
-        _layer_method.__name__ = _layer_name
-        _layer_method.__doc__ = """
-THIS METHOD IS AUTOMATICALLY GENERATED
+    if kind == "map":
+        cls.register_map_method(f, entry["library"], alias=entry["name"])
+    elif kind == "layer":
+        _register_layer_method(cls, entry["source"], f, entry["library"])
+    elif kind == "scope":
+        _register_scope_method(cls, entry["source"], f, entry["library"])
+    elif kind == "method":
+        cls.register_method(f, entry["library"], alias=entry["name"], doc=f.__doc__)
+    else:
+        raise ValueError("Unknown manifest entry kind: {0}".format(kind))
 
-Alias for `.fully_connected(size, activation_fn = {1}.{0}, ...)`
+def _register_lazy_entry(classes, entry):
+    classes[entry["class"]].register_lazy_method(entry["name"], lambda: apply_entry(classes, entry))
 
-**Arguments**
+def _resolve(module, source):
+    return getattr(_import(module), source)
 
-* `size`: the size of the resulting layer
-* All other \*args and \*\*kwargs are forwarded to `tf.contrib.layers.fully_connected`
+def _import(module):
+    if module not in _modules:
+        parts = module.split(".")
+        obj = importlib.import_module(parts[0])
 
-**Return**
+        for i, part in enumerate(parts[1:]):
+            obj = getattr(obj, part, None) or importlib.import_module(".".join(parts[:i + 2]))
 
-Builder
+        _modules[module] = obj
 
-**Origial documentation for {1}.{0}**
+    return _modules[module]
 
-    def {2}:
+_modules = {}
 
-{3}
-        """.format(_name, _module_name, _f_signature, _f_docs)
 
-        # Builder
-        Builder.register_map_method(f, _module_name) #This should go first
-        Builder.register_method(_layer_method, _module_name, alias = _layer_name, doc = _layer_method.__doc__)
+###############################
+#### Method definitions
+###############################
 
+def _tree_fully_connected(tree, size, *args, **kwargs):
+    """
+    Reduces all leaf nodes of a to a single layer. To do this, it first creates a `fully_connected` linear layer of size `size` for each leaf node, then it adds all these together to create a single layer. At this point if `activation_fn` is defined it applies it to this sum.
 
-        # Tree
-        BuilderTree.register_method(_layer_method, _module_name, alias=_layer_name, doc = _layer_method.__doc__)
+    By default the layer is fused: the sum of a linear layer per leaf is the same as a single linear layer over the leaves concatenated along their last dimension, so the leaves are concatenated and a single `fully_connected` (one weight matrix, one bias) is created instead of one matmul and bias per leaf plus the additions. Pass `fused=False` to create a layer per leaf. Leaves that can't be concatenated (different dtypes, ranks or leading dimensions) and `normalizer_fn`, which is applied per leaf, always use the unfused version.
 
-    #######################
-    ### linear_layer
-    #######################
+    > **Note:** This function behaves slightly different to `tf.contrib.layers.fully_connected` since that function has `tf.nn.relu` as the default for `activation_fn`, that behavior might be unexpected so we initialize it as `None`.
 
-    def linear_layer(builder, size, *args, **kwargs):
-        """
-        Alias for `.fully_connected(size, activation_fn = None, ...)`
+    **Arguments**
 
-        **Arguments**
+    * `size`: the size of the resulting layer
+    * `fused`: whether to create a single layer over the concatenated leaves (default: `True`)
+    * All other \*args and \*\*kwargs are forwarded to `tf.contrib.layers.fully_connected`
 
-        * `size`: the size of the resulting layer
-        * All other \*args and \*\*kwargs are forwarded to `tf.contrib.layers.fully_connected`
+    **Return**
 
-        **Return**
+    Builder
 
-        Builder
-        """
-        kwargs['activation_fn'] = None
-        return builder.fully_connected(size, *args, **kwargs)
+    **Examples**
+    """
+    activation_fn = kwargs.pop("activation_fn", None)
+    fused = kwargs.pop("fused", True)
+    kwargs["activation_fn"] = None
 
-    Builder.register_method(linear_layer, "tensorbuilder")
-    BuilderTree.register_method(linear_layer, "tensorbuilder")
+    if plan.is_lazy(tree):
+        # recorded unfused, `_fuse_fully_connected` fuses the layers when the plan is materialized
+        layers = tree.map_each(tf.contrib.layers.fully_connected, size, *args, **kwargs)
+        builder = layers.reduce(tf.add) if fused else layers.extract(_add_n)
+    else:
+        builder = tree.Builder(_fully_connected_sum(tree.tensors(), (size,) + args, kwargs, fused))
 
-    #######################
-    ### flatten
-    #######################
+    if activation_fn:
+        builder = builder.map(activation_fn)
 
-    Builder.register_map_method(tl.layers.core.flatten, "tflearn.layers.core.flatten")
+    return builder
 
-    #######################
-    ### scopes
-    #######################
+def _fully_connected_sum(tensors, args, kwargs, fused=True):
+    "Sum of a linear `fully_connected` layer per tensor, computed as a single layer over the concatenated tensors if possible"
+    if fused and len(tensors) > 1 and not kwargs.get("normalizer_fn") and _concatenable(tensors):
+        h = _concat(tensors, tensors[0].get_shape().ndims - 1)
+        return tf.contrib.layers.fully_connected(h, *args, **kwargs)
 
-    def get_scope_method(f):
-        def scope_method(builder, *args, **kwargs):
-            return builder.then_with(f, *args, **kwargs)
-        return scope_method
+    return _add_n([ tf.contrib.layers.fully_connected(tensor, *args, **kwargs) for tensor in tensors ])
 
+def _concatenable(tensors):
+    "The leaves need the same dtype and the same static shape except for the last dimension, else the unfused layers would broadcast where `tf.concat` fails. Unknown dimensions (e.g. the batch) are assumed to be equal if they are unknown in every leaf."
+    try:
+        shapes = [ t.get_shape() for t in tensors ]
+        dtypes = set( t.dtype for t in tensors )
+    except AttributeError:
+        return False
 
-    scope_funs = (
-        [ (name, f, "tf") for (name, f) in inspect.getmembers(tf, inspect.isfunction) if name in scope_functions ]
+    if len(dtypes) != 1 or shapes[0].ndims is None:
+        return False
+
+    return all( shape.ndims == shapes[0].ndims and shape.as_list()[:-1] == shapes[0].as_list()[:-1] for shape in shapes )
+
+def _concat(tensors, axis):
+    "`tf.concat` takes the axis first before TensorFlow 1.0"
+    if int(tf.__version__.split(".")[0]) < 1:
+        return tf.concat(axis, tensors)
+
+    return tf.concat(tensors, axis)
+
+def linear_layer(builder, size, *args, **kwargs):
+    """
+    Alias for `.fully_connected(size, activation_fn = None, ...)`
+
+    **Arguments**
+
+    * `size`: the size of the resulting layer
+    * All other \*args and \*\*kwargs are forwarded to `tf.contrib.layers.fully_connected`
+
+    **Return**
+
+    Builder
+    """
+    kwargs['activation_fn'] = None
+    return builder.fully_connected(size, *args, **kwargs)
+
+
+###############################
+#### Reductions
+###############################
+
+def register_reductions(BuilderTree):
+    """
+    Registers the associative TensorFlow functions so `BuilderTree.reduce` emits a single `tf.add_n` for `tf.add` and balanced trees for `tf.maximum`, `tf.minimum` and `tf.multiply` instead of a chain of ops.
+    """
+    BuilderTree.register_associative_reduce(tf.add, _add_n)
+
+    for name in ["maximum", "minimum", "multiply", "mul"]:
+        f = getattr(tf, name, None)
+
+        if f:
+            BuilderTree.register_associative_reduce(f)
+
+def _add_n(tensors):
+    "`tf.add_n` doesn't broadcast, it is only used if all the tensors have the same fully defined static shape and dtype, unknown dimensions could broadcast at run time"
+    if len(tensors) > 1 and _same_shape(tensors):
+        return tf.add_n(tensors)
+
+    return utils.balanced_reduce(tf.add, tensors)
+
+def _same_shape(tensors):
+    try:
+        shapes = [ t.get_shape() for t in tensors ]
+        dtypes = set( t.dtype for t in tensors )
+    except AttributeError:
+        return False
+
+    if len(dtypes) != 1 or not all( shape.is_fully_defined() for shape in shapes ):
+        return False
+
+    return all( shape.as_list() == shapes[0].as_list() for shape in shapes )
+
+
+###############################
+#### Plan passes
+###############################
+
+def register_plan_passes():
+    """
+    Registers the optimizations applied to lazy builders (see `tensorbuilder.core.plan`) before they are materialized:
+
+    * `_collapse_idempotent`: `f(f(x))` is replaced by `f(x)` for idempotent elementwise functions like `tf.nn.relu`.
+    * `_fuse_fully_connected`: `reduce(tf.add)` over linear `fully_connected` layers of each leaf, as recorded by `BuilderTree.fully_connected`, is replaced by a single layer over the concatenated leaves.
+    """
+    plan.register_pass(_collapse_idempotent)
+    plan.register_pass(_fuse_fully_connected)
+
+_idempotent_names = [("nn", "relu"), ("nn", "relu6"), (None, "abs"), (None, "sign"), (None, "floor"), (None, "ceil"), (None, "round"), (None, "identity")]
+_idempotent = set( getattr(tf.nn if module else tf, name) for module, name in _idempotent_names if hasattr(tf.nn if module else tf, name) )
+
+def _collapse_idempotent(node):
+    if node.kind != "map" or node.fn not in _idempotent or node.args or node.kwargs:
+        return None
+
+    x = node.inputs[0]
+
+    if x.kind == "map" and x.fn is node.fn and not x.args and not x.kwargs and x.scopes == node.scopes:
+        return x
+
+def _fuse_fully_connected(node):
+    if node.kind != "reduce" or node.fn is not tf.add or node.kwargs["initializer"] is not None or node.kwargs["balanced"] is False:
+        return None
+
+    layers = node.inputs
+    first = layers[0]
+
+    if len(layers) < 2 or "activation_fn" not in first.kwargs or first.kwargs["activation_fn"] is not None:
+        return None
+
+    for layer in layers:
+        if layer.kind != "map" or layer.fn is not tf.contrib.layers.fully_connected or layer.consumers != 1 or layer.scopes != node.scopes:
+            return None
+
+        if layer.args != first.args or layer.kwargs != first.kwargs:
+            return None
+
+    args, kwargs = first.args, first.kwargs
+
+    return plan.Node(
+        "fused_fully_connected", [ layer.inputs[0] for layer in layers ], tf.contrib.layers.fully_connected, args, kwargs,
+        compute=lambda tensors: _fully_connected_sum(tensors, args, kwargs),
+        scopes=node.scopes, index=node.index
     )
 
 
-    for name, f, module_name in scope_funs:
-        method_name = "with_" + name
-        f_signature = utils.get_method_sig(f)
-        f_docs = inspect.getdoc(f)
+###############################
+#### Estimators
+###############################
+
+_elementwise_names = [
+    "relu", "relu6", "elu", "softplus", "softsign", "sigmoid", "tanh", "softmax", "log_softmax", "dropout", "bias_add",
+    "identity", "abs", "neg", "sign", "exp", "log", "square", "sqrt", "rsqrt", "floor", "ceil", "round", "add", "sub", "subtract", "mul", "multiply", "div", "divide", "maximum", "minimum", "pow"
+]
+
+def register_estimators():
+    """
+    Registers the estimators used by `tensorbuilder.core.cost.estimate` for the methods of this patch: `fully_connected`, `linear_layer` and the `*_layer` methods, `convolution2d`, `max_pool_2d`, `flatten`, `polynomic`, `reduce` and the elementwise functions of `tf` and `tf.nn`.
+    """
+    for tree in [False, True]:
+        for name in ["tensor", "tensors", "builders", "copy"]:
+            cost.register_estimator(name, cost.identity, tree=tree)
+
+    for name in _elementwise_names:
+        cost.register_estimator(name, cost.elementwise)
+        cost.register_estimator(name, cost.elementwise, tree=True)
+
+    cost.register_estimator("fully_connected", _fully_connected_cost)
+    cost.register_estimator("linear_layer", _fully_connected_cost)
+    cost.register_estimator("convolution2d", _convolution2d_cost)
+    cost.register_estimator("max_pool_2d", _max_pool_2d_cost)
+    cost.register_estimator("flatten", _flatten_cost)
+    cost.register_estimator("polynomic", _polynomic_cost)
+
+    cost.register_estimator("fully_connected", _tree_fully_connected_cost, tree=True)
+    cost.register_estimator("linear_layer", _tree_fully_connected_cost, tree=True)
+    cost.register_estimator("reduce", _reduce_cost, tree=True)
 
-        scope_method = get_scope_method(f)
+    cost.register_resolver(_layer_cost_resolver)
 
-        scope_method.__name__ = method_name
-        scope_method.__doc__ = """
+def _layer_cost_resolver(name, tree):
+    if name.endswith("_layer"):
+        return _tree_fully_connected_cost if tree else _fully_connected_cost
+
+def _fully_connected_cost(shape, num_outputs, *args, **kwargs):
+    bias = num_outputs if kwargs.get("biases_initializer", True) is not None and not kwargs.get("normalizer_fn") else 0
+    positions = _product(shape[:-1])
+
+    return shape[:-1] + (num_outputs,), shape[-1] * num_outputs + bias, positions * shape[-1] * num_outputs
+
+def _tree_fully_connected_cost(shapes, num_outputs, *args, **kwargs):
+    "Cost of the layer built by `_tree_fully_connected`, a single layer over the concatenated leaves if its fused else a layer per leaf"
+    fused = kwargs.pop("fused", True)
+
+    if fused and len(shapes) > 1 and not kwargs.get("normalizer_fn") and len(set( shape[:-1] for shape in shapes )) == 1:
+        shape = shapes[0][:-1] + (sum( shape[-1] for shape in shapes ),)
+        return _fully_connected_cost(shape, num_outputs, *args, **kwargs)
+
+    costs = [ _fully_connected_cost(shape, num_outputs, *args, **kwargs) for shape in shapes ]
+
+    return costs[0][0], sum( params for _, params, _ in costs ), sum( flops for _, _, flops in costs )
+
+def _convolution2d_cost(shape, num_outputs, kernel_size, stride=1, padding="SAME", *args, **kwargs):
+    height, width, channels = shape
+    kernel_height, kernel_width = _pair(kernel_size)
+    out_height, out_width = _pool_size(height, kernel_height, _pair(stride)[0], padding), _pool_size(width, kernel_width, _pair(stride)[1], padding)
+    bias = num_outputs if kwargs.get("biases_initializer", True) is not None and not kwargs.get("normalizer_fn") else 0
+    weights = kernel_height * kernel_width * channels * num_outputs
+
+    return (out_height, out_width, num_outputs), weights + bias, out_height * out_width * weights
+
+def _max_pool_2d_cost(shape, kernel_size, strides=None, padding="same", *args, **kwargs):
+    height, width, channels = shape
+    kernel_height, kernel_width = _pair(kernel_size)
+    stride_height, stride_width = _pair(strides if strides is not None else kernel_size)
+
+    return (_pool_size(height, kernel_height, stride_height, padding), _pool_size(width, kernel_width, stride_width, padding), channels), 0, 0
+
+def _flatten_cost(shape, *args, **kwargs):
+    return (_product(shape),), 0, 0
+
+def _polynomic_cost(shape, degree=None, *args, **kwargs):
+    return (shape if degree is None else shape[:-1] + (shape[-1] * degree,)), 0, 0
+
+def _reduce_cost(shapes, fn, *args, **kwargs):
+    return shapes[0], 0, 0
+
+def _pair(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(value) if len(value) == 2 else (value[1], value[2]) #NHWC
+
+    return value, value
+
+def _pool_size(size, kernel, stride, padding):
+    if size is None:
+        return None
+
+    if padding.upper() == "VALID":
+        size = size - kernel + 1
+
+    return (size + stride - 1) // stride
+
+def _product(shape):
+    result = 1
+
+    for dim in shape:
+        result *= dim if dim is not None else 1
+
+    return result
+
+
+def _get_layer_method(f):
+    def _layer_method(builder, size, *args, **kwargs):
+        kwargs['activation_fn'] = f
+        return builder.fully_connected(size, *args, **kwargs)
+
+    return _layer_method
+
+def _register_layer_method(cls, _name, f, _module_name):
+    _layer_name = _name + "_layer"
+    _layer_method = _get_layer_method(f)
+
+    _layer_method.__name__ = _layer_name
+    cls.register_method(_layer_method, _module_name, alias = _layer_name, doc = utils.method_docs(_layer_method_docs, _name, _module_name, _layer_name, f))
+
+def _layer_method_docs(_name, _module_name, _layer_name, _f_signature, _f_docs):
+    return """
 THIS METHOD IS AUTOMATICALLY GENERATED
 
-Alias for `.then_with({1}.{0}, ...)`
+Alias for `.fully_connected(size, activation_fn = {1}.{0}, ...)`
 
 **Arguments**
 
+* `size`: the size of the resulting layer
 * All other \*args and \*\*kwargs are forwarded to `tf.contrib.layers.fully_connected`
 
 **Return**
 
-Function of type `(Builder -> Builder) -> Builder`
+Builder
 
 **Origial documentation for {1}.{0}**
 
     def {2}:
 
 {3}
-        """.format(name, module_name, f_signature, f_docs)
+    """.format(_name, _module_name, _f_signature, _f_docs)
 
-        # Builder
-        Builder.register_method(scope_method, module_name, alias=method_name, doc = scope_method.__doc__)
 
-    ###############################
-    # tflearn
-    ###############################
+def get_scope_method(f):
+    def scope_method(builder, *args, **kwargs):
+        return builder.then_with(f, *args, **kwargs)
+    return scope_method
 
-    Builder.register_map_method(tl.layers.conv.max_pool_2d, "tflearn.layers")
+def _register_scope_method(cls, name, f, module_name):
+    method_name = "with_" + name
+    scope_method = get_scope_method(f)
 
-    #######################
-    ### clone tb + tr
-    #######################
+    scope_method.__name__ = method_name
+    cls.register_method(scope_method, module_name, alias=method_name, doc = utils.method_docs(_scope_method_docs, name, module_name, method_name, f))
 
-    def _get_app_method(f):
-        def _method(app, *args, **kwargs):
-            def _lambda(builder):
-                g = getattr(builder, f.__name__)
-                return g(*args, **kwargs)
-            return app.compose(_lambda)
-        return _method
+def _scope_method_docs(name, module_name, method_name, f_signature, f_docs):
+    return """
+THIS METHOD IS AUTOMATICALLY GENERATED
 
+Alias for `.then_with({1}.{0}, ...)`
 
+**Arguments**
 
-    _dsl_funs = (
-        [ ("BuilderTree", _name, f) for  _name, f in inspect.getmembers(BuilderTree, inspect.ismethod) if _name[0] != '_' and _name not in applicative_tree_blacklist ] +
-        [ ("Builder", _name, f) for  _name, f in inspect.getmembers(Builder, inspect.ismethod) if _name[0] != '_' and _name not in applicative_builder_blacklist ]
-    )
+* All other \*args and \*\*kwargs are forwarded to `tf.contrib.layers.fully_connected`
 
-    for _module_name, _name, f in _dsl_funs:
-        _f_signature = utils.get_method_sig(f)
-        _f_docs = inspect.getdoc(f)
+**Return**
 
-        _method = _get_app_method(f)
+Function of type `(Builder -> Builder) -> Builder`
 
-        _method.__name__ = _name
-        _method.__doc__ = """
+**Origial documentation for {1}.{0}**
+
+    def {2}:
+
+{3}
+    """.format(name, module_name, f_signature, f_docs)
+
+def _get_app_method(_name):
+    def _method(app, *args, **kwargs):
+        return app.compose(dsl.call_method, _name, *args, **kwargs)
+    return _method
+
+def _register_app_method(Applicative, _name, cls):
+    _method = _get_app_method(_name)
+
+    _method.__name__ = _name
+    Applicative.register_method(_method, cls.__name__, doc = utils.LazyDoc(_app_method_docs, _name, cls))
+
+def _app_method_docs(_name, cls):
+    f = getattr(cls, _name)
+
+    return """
 THIS METHOD IS AUTOMATICALLY GENERATED
 
 Alias for `.compose({1}.{0}, ...)`
@@ -262,6 +607,77 @@ Applicative
     def {2}:
 
 {3}
-        """.format(_name, _module_name, _f_signature, _f_docs)
+    """.format(_name, cls.__name__, utils.get_method_sig(f), inspect.getdoc(f))
+
+
+###############################
+#### Lazy lookup
+###############################
+
+def _tf_members():
+    "The public functions of `tf.nn` and then `tf` as `(name, f, module_name)`, `name` being the attribute of the module"
+    return (
+        [ (name, f, "tf.nn") for (name, f) in inspect.getmembers(tf.nn, inspect.isfunction) if name not in builders_blacklist and not name.startswith("_") ] +
+        [ (name, f, "tf") for (name, f) in inspect.getmembers(tf, inspect.isfunction) if name not in builders_blacklist and not name.startswith("_") ]
+    )
+
+def _tf_map_function(name):
+    """
+    Returns `(f, module_name)` for the function `patch_classes` registers as the map method `name`, which is named after `f.__name__` and not after the attribute. That is the attribute for almost every function so `tf` and `tf.nn` are checked directly, the few functions whose `__name__` differs (e.g. `tf.negative` is `neg`) are found in `_tf_aliases`. `*_layer` and blacklisted names are never aliases.
+    """
+    if name in builders_blacklist:
+        return None, None
+
+    for module, module_name in [(tf, "tf"), (tf.nn, "tf.nn")]:
+        f = getattr(module, name, None)
+
+        if inspect.isfunction(f) and f.__name__ == name:
+            return f, module_name
+
+    entry = _tf_aliases().get(name) if not name.endswith("_layer") else None
+
+    if entry is None:
+        return None, None
+
+    return _resolve(entry["module"], entry["source"]), entry["library"]
+
+def _tf_aliases():
+    """
+    Returns a dict `name -> entry` of the map methods of `tf` and `tf.nn` whose name isn't the attribute of the function. They are taken from the cached manifest, which is read once, the manifest is never built here: without it the dict is empty.
+    """
+    global _tf_aliases_by_name
+
+    if _tf_aliases_by_name is None:
+        entries = manifest.load() or []
+
+        _tf_aliases_by_name = {
+            entry["name"]: entry for entry in entries
+            if entry["class"] == "Builder" and entry["kind"] == "map" and entry["library"] in ("tf", "tf.nn") and entry["name"] != entry["source"]
+        }
+
+    return _tf_aliases_by_name
+
+_tf_aliases_by_name = None
+
+def _tf_function(name):
+    """
+    Looks up `name` in `tf` and then in `tf.nn`, `tf` goes first because `patch_classes` registers the functions of `tf` after those of `tf.nn` so they take precedence.
+    """
+    for module, module_name in [(tf, "tf"), (tf.nn, "tf.nn")]:
+        f = getattr(module, name, None)
+
+        if inspect.isfunction(f):
+            return f, module_name
+
+    return None, None
+
+def _tf_layer_function(name):
+    if not name.endswith("_layer"):
+        return None, None
+
+    _name = name[:-len("_layer")]
+
+    if _name in builders_blacklist:
+        return None, None
 
-        Applicative.register_method(_method, _module_name, doc = _method.__doc__)
+    return _tf_function(_name)
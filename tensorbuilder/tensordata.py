@@ -1,11 +1,13 @@
-import asq
-from asq.initiators import query
-import asq.queryables
-import random
-from itertools import islice, izip_longest
+import sys
+import time
+import Queue
+import pickle
+import traceback
+import threading
+import multiprocessing
 import numpy as np
+from multiprocessing.sharedctypes import RawArray
 from core.utils import immutable
-import tensorflow as tf
 
 """
 """
@@ -13,17 +15,60 @@ def data(*args, **kwargs):
     return Data(*args, **kwargs)
 
 class Data(object):
-    """docstring for Data"""
-    def __init__(self, _iterator=None, **sources):
+    """
+    A set of named sources, arrays with the same number of rows (e.g. `x` and `y`), that can be split and iterated in batches and epochs. Each source is also an attribute of the object.
+
+    A Data can be an *index view* (see `split`): instead of its own arrays it holds a reference to the sources of the Data it was split from plus the array `indexes` of its rows, rows are only gathered when they are needed, e.g. per batch. Reading a source of a view (`data.x`, `data.sources`) gathers all its rows.
+    """
+    def __init__(self, _iterator=None, _indexes=None, _prefetch_stats=None, **sources):
         super(Data, self).__init__()
-        self.sources = sources
-        self.__dict__.update(sources)
+        self._sources = sources
+        self._indexes = _indexes
+        self._prefetch_stats = _prefetch_stats
+
+        if _indexes is None:
+            self.__dict__.update(sources)
 
         self._iterator = _iterator if _iterator else lambda: self._raw_data()
 
+    def __getattr__(self, name):
+        # sources of index views are gathered on access
+        sources = self.__dict__.get("_sources")
+
+        if sources is not None and name in sources:
+            return self._gather(sources[name], self._indexes)
+
+        raise AttributeError("'Data' object has no attribute '{0}'".format(name))
+
+    @property
+    def sources(self):
+        "A dict with the arrays of the sources, for index views the rows are gathered"
+        if self._indexes is None:
+            return self._sources
+
+        return { k: self._gather(source, self._indexes) for (k, source) in self._sources.iteritems() }
+
+    @property
+    def indexes(self):
+        "The rows of the original sources if this Data is an index view, else `None`"
+        return self._indexes
+
+    @property
+    def prefetch_stats(self):
+        "The `PrefetchStats` of the last `prefetch` of the pipeline, kept by the Data created from it (e.g. with `map` or `batch`), or `None` if there is no `prefetch`"
+        return self._prefetch_stats
 
     def copy(self):
-        return Data(_iterator=self._iterator, **self.sources)
+        return Data(_iterator=self._iterator, _indexes=self._indexes, _prefetch_stats=self._prefetch_stats, **self._sources)
+
+    def _length(self):
+        if self._indexes is not None:
+            return len(self._indexes)
+
+        return len(next(self._sources.itervalues())) if self._sources else 0
+
+    def _gather(self, source, indexes):
+        return np.take(source, indexes, axis=0)
 
     def __iter__(self):
         return self._iterator()
@@ -32,26 +77,45 @@ class Data(object):
         return enumerate(self._iterator())
 
 
-    def split(self, *splits):
-        """docstring for Batcher"""
+    def split(self, *splits, **kwargs):
+        """
+        Shuffles the rows and splits them in parts proportional to `splits`, e.g. `data.split(0.6, 0.2, 0.2)` returns the training, validation and test sets.
+
+        **Arguments**
+
+        * `*splits`: the proportion of each part.
+        * `seed`: an `int` or a `np.random.RandomState` used to shuffle, with the same seed the parts are always the same. If `None` the global state of `np.random` is used. (default: `None`)
+        * `view`: if `True` the parts are index views, they share the sources of this Data and only hold the indexes of their rows, so splitting doesn't copy any array and batches gather their rows when they are created. If `False` the rows of each part are copied. (default: `False`)
+
+        **Return**
+
+        A list of Data, one per split.
+        """
+        seed = kwargs.pop("seed", None)
+        view = kwargs.pop("view", False)
+
+        if kwargs:
+            raise TypeError("split() got an unexpected keyword argument '{0}'".format(list(kwargs)[0]))
 
-        data_length = len(self.x)
+        data_length = self._length()
+        permutation = _random_state(seed).permutation(data_length)
 
-        indexes = range(data_length)
-        random.shuffle(indexes)
+        if self._indexes is not None:
+            permutation = self._indexes[permutation]
 
-        splits = [0] + list(splits)
         splits_total = sum(splits)
+        bounds = [0]
+
+        for n in splits:
+            bounds.append(bounds[-1] + n)
 
-        return (
-            query(splits)
-            .scan()
-            .select(lambda n: int(data_length * n / splits_total))
-            .then(_window, n=2)
-            .select(lambda (start, end): np.array(indexes[start:end]))
-            .select(lambda split: Data(**{k: source[split,:] for (k, source) in self.sources.iteritems()}))
-            .to_list()
-        )
+        bounds = [ int(data_length * n / splits_total) for n in bounds ]
+        parts = [ permutation[start:end] for start, end in zip(bounds[:-1], bounds[1:]) ]
+
+        if view:
+            return [ Data(_indexes=part, **self._sources) for part in parts ]
+
+        return [ Data(**{k: self._gather(source, part) for (k, source) in self._sources.iteritems()}) for part in parts ]
 
 
     @immutable
@@ -64,23 +128,70 @@ class Data(object):
 
 
     @immutable
-    def batch(self, batch_size):
+    def shuffle(self, seed=None):
+        """
+        Shuffles the rows every time the data is iterated, e.g. with `data.shuffle().batch(32).epochs(10)` each epoch visits the rows in a new order. No array is copied, each pass yields an index view (see `split`) with a fresh permutation and `batch` gathers the rows of each batch.
+
+        **Arguments**
+
+        * `seed`: an `int` or a `np.random.RandomState`, with the same seed the sequence of permutations is always the same. If `None` the global state of `np.random` is used. (default: `None`)
+        """
+        _iterator = self._iterator
+        random_state = _random_state(seed)
+        self._iterator = lambda: self._shuffle(random_state, _iterator)
+        return self
+
+    def _shuffle(self, random_state, _iterator):
+        for data in _iterator():
+            permutation = random_state.permutation(data._length())
+
+            if data._indexes is not None:
+                permutation = data._indexes[permutation]
+
+            yield Data(_indexes=permutation, **data._sources)
+
+
+    @immutable
+    def batch(self, batch_size, reuse=False, buffers=1):
         """
-        docstring for Batcher
+        Iterates the rows in batches of `batch_size` rows, the last batch can be smaller. Batches of a Data with its own arrays are slices (views) of them, batches of an index view (see `split` and `shuffle`) gather their rows with `np.take`.
+
+        **Arguments**
+
+        * `batch_size`: the number of rows of each batch.
+        * `reuse`: if `True` the batches are lightweight `Batch` objects instead of `Data`, and the rows gathered for index views are written into a ring of `buffers` arrays per source preallocated once per pass instead of new arrays for each batch. (default: `False`)
+        * `buffers`: the size of the ring used when `reuse` is `True`. (default: `1`)
+
+        **Lifetime of reused batches**
+
+        With `reuse=True` the arrays of a batch gathered from an index view are overwritten when the batch `buffers` positions later is produced: with the default ring of 1 they are only valid until the next batch is requested. Consumers that keep batches around (e.g. a prefetch queue) need a ring larger than the number of batches they hold, or must `copy()` the batches they keep. Batches of a Data with its own arrays are views of the sources and stay valid.
         """
+        if buffers < 1:
+            raise ValueError("buffers must be at least 1, got {0}".format(buffers))
+
         _iterator = self._iterator
-        self._iterator = lambda: self._batch(batch_size, _iterator)
+        self._iterator = lambda: self._batch(batch_size, _iterator, reuse, buffers)
         return self
 
-    def _batch(self, batch_size, _iterator):
+    def _batch(self, batch_size, _iterator, reuse=False, buffers=1):
         for data in _iterator():
+            if reuse:
+                for batch in _reused_batches(data, batch_size, buffers):
+                    yield batch
+                continue
+
             i = 0
-            length = len(data.x)
+            length = data._length()
+
             while i * batch_size < length:
                 start = i * batch_size
                 end = min(start + batch_size, length)
 
-                new_data = Data(**{k: source[start:end,:] for (k, source) in data.sources.iteritems()})
+                if data._indexes is None:
+                    new_data = Data(**{k: source[start:end] for (k, source) in data._sources.iteritems()})
+                else:
+                    new_data = Data(**{k: data._gather(source, data._indexes[start:end]) for (k, source) in data._sources.iteritems()})
+
                 new_data.batch = i
 
                 yield new_data
@@ -100,45 +211,415 @@ class Data(object):
                 yield data
 
 
+    @immutable
+    def prefetch(self, n, stats=None):
+        """
+        Produces the elements of the iterator (e.g. the batches) on a background thread that keeps up to `n` of them ready in a bounded queue, so preparing the next batches overlaps with the training step that consumes the current one. Exceptions of the producer are raised by the consumer and if the consumer stops early the producer is stopped as well.
+
+        **Arguments**
+
+        * `n`: the size of the queue.
+        * `stats`: a `PrefetchStats` where the counters are accumulated, if `None` a new one is created. Either way its available as the attribute `prefetch_stats` of the returned Data and of the Data created from it, e.g. `data.prefetch(2).map(fn).prefetch_stats`.
+
+        > **Note:** batches produced with `batch(..., reuse=True)` are overwritten by later batches, use a ring of at least `n + 2` buffers so the batches waiting in the queue, the one being produced and the one being consumed don't share them.
+        """
+        if n < 1:
+            raise ValueError("n must be at least 1, got {0}".format(n))
+
+        _iterator = self._iterator
+        stats = stats if stats is not None else PrefetchStats()
+        self._prefetch_stats = stats
+        self._iterator = lambda: _prefetch(n, _iterator, stats)
+        return self
+
+
+    @immutable
+    def map(self, fn, workers=None, vectorized=True, ordered=True):
+        """
+        Applies `fn` to the sources of each element of the iterator (e.g. each batch) and yields the results as new Data objects, which keep the `batch` and `epoch` of the element. Use it for CPU bound augmentations and feature transforms written in Python, with `workers` they run in parallel on a process pool.
+
+        **Arguments**
+
+        * `fn`: if `vectorized` a function `dict(name: array) -> dict(name: array)` called with the sources of a whole batch, else the same kind of function called with the sources of a single row whose results are stacked.
+        * `workers`: the number of processes that run `fn`, if `None` or `0` it runs in the current process. (default: `None`)
+        * `vectorized`: see `fn`. (default: `True`)
+        * `ordered`: if `False` the results are yielded as soon as they are ready instead of in the order of the input. (default: `True`)
+
+        The arrays go to and from the workers through shared memory (sized after the first element, elements that don't fit are pickled), only their shapes and types are pickled and the results are copied out of shared memory before being yielded. The workers are forked so `fn` doesn't have to be picklable, lambdas and closures work. The workers are started on each pass and terminated when the pass ends, fails or the consumer stops early, if a worker dies (e.g. it is killed) the pass raises a `RuntimeError`.
+        """
+        _iterator = self._iterator
+        self._iterator = lambda: _map(fn, workers, vectorized, ordered, _iterator)
+        return self
+
+
     def placeholders(self, *args):
         return list(self._placeholders(*args))
 
     def _placeholders(self, *args):
+         import tensorflow as tf
+
          for source_name in args:
-             source = self.sources[source_name]
+             source = self._sources[source_name]
              shape = [None] + list(source.shape)[1:]
              yield tf.placeholder(tf.float32, shape=shape)
 
 
     def run(self, sess, tensor, tensors={}, **feed):
-        feed = { feed[k]: self.sources[k] for k in feed }
-        feed.update(tensors)
+        return _run(sess, tensor, tensors, feed, self.sources)
+
+
+class Batch(object):
+    """
+    A batch yielded by `Data.batch(..., reuse=True)`. A lightweight alternative to `Data` for the hot loop: it only has the `sources` of the batch, also accessible as attributes, its index `batch`, the `epoch` (if iterated with `Data.epochs`) and `run`.
+
+    Its arrays may be buffers that are reused by later batches, see `Data.batch` for their lifetime, `copy` returns a `Data` with its own copy of them.
+    """
+    __slots__ = ("sources", "batch", "epoch")
+
+    def __init__(self, sources, batch):
+        self.sources = sources
+        self.batch = batch
+
+    def __getattr__(self, name):
+        if name != "sources" and name in self.sources:
+            return self.sources[name]
+
+        raise AttributeError("'Batch' object has no attribute '{0}'".format(name))
+
+    def copy(self):
+        data = Data(**{k: source.copy() for (k, source) in self.sources.iteritems()})
+        data.batch = self.batch
+
+        if hasattr(self, "epoch"):
+            data.epoch = self.epoch
+
+        return data
+
+    def run(self, sess, tensor, tensors={}, **feed):
+        return _run(sess, tensor, tensors, feed, self.sources)
+
+
+class PrefetchStats(object):
+    """
+    Throughput counters of `Data.prefetch`, accumulated over every pass.
+
+    * `produced`, `consumed`: the number of elements put in and taken from the queue.
+    * `producer_wait`: seconds the producer waited for the queue to have room, high if the consumer is the bottleneck.
+    * `consumer_wait`: seconds the consumer waited for an element, high if the input pipeline is the bottleneck.
+    * `elapsed`: seconds spent iterating.
+    """
+
+    def __init__(self):
+        self.produced = 0
+        self.consumed = 0
+        self.producer_wait = 0.0
+        self.consumer_wait = 0.0
+        self.elapsed = 0.0
+
+    @property
+    def per_second(self):
+        "Elements consumed per second"
+        return self.consumed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return "PrefetchStats(produced={0}, consumed={1}, producer_wait={2:.3f}s, consumer_wait={3:.3f}s, per_second={4:.1f})".format(self.produced, self.consumed, self.producer_wait, self.consumer_wait, self.per_second)
+
+
+def _prefetch(n, _iterator, stats):
+    queue = Queue.Queue(n)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce, args=(_iterator, queue, stop, stats))
+    producer.daemon = True
+    producer.start()
+    start = time.time()
+
+    try:
+        while True:
+            wait = time.time()
+            kind, value = _get(queue, lambda: _check_producer(producer, queue))
+            stats.consumer_wait += time.time() - wait
+
+            if kind == _END:
+                break
+
+            if kind == _ERROR:
+                raise value[0], value[1], value[2]
+
+            stats.consumed += 1
+            yield value
+    finally:
+        # also runs when the consumer stops early and the generator is closed
+        stop.set()
+        producer.join()
+        stats.elapsed += time.time() - start
+
+def _check_producer(producer, queue):
+    # once the producer is dead nothing else is put, an empty queue means its end was never signaled
+    if not producer.is_alive() and queue.empty():
+        raise RuntimeError("the prefetch producer thread exited without signaling its end")
+
+def _produce(_iterator, queue, stop, stats):
+    iterator = _iterator()
+
+    try:
+        for value in iterator:
+            wait = time.time()
+
+            if not _put(queue, stop, (_ITEM, value)):
+                return
+
+            stats.producer_wait += time.time() - wait
+            stats.produced += 1
+
+        _put(queue, stop, (_END, None))
+    except:
+        _put(queue, stop, (_ERROR, sys.exc_info()))
+    finally:
+        if hasattr(iterator, "close"):
+            iterator.close()
+
+def _put(queue, stop, entry):
+    "Puts `entry` in the queue unless the consumer stops, returns whether it was put"
+    while not stop.is_set():
+        try:
+            queue.put(entry, timeout=0.05)
+            return True
+        except Queue.Full:
+            pass
+
+    return False
+
+# kinds of the entries of the prefetch queue and of the results of the map workers
+_ITEM, _END, _ERROR, _SHARED, _PICKLED = range(5)
+
+_DONE = object()
+
+def _run(sess, tensor, tensors, feed, sources):
+    feed = { feed[k]: sources[k] for k in feed }
+    feed.update(tensors)
+
+    return sess.run(tensor, feed_dict=feed)
+
+def _reused_batches(data, batch_size, buffers):
+    length = data._length()
+    sources = data._sources.items()
+    indexes = data._indexes
+    ring = _ring(data, batch_size, buffers) if indexes is not None else None
+
+    for i, start in enumerate(xrange(0, length, batch_size)):
+        end = min(start + batch_size, length)
+
+        if indexes is None:
+            yield Batch({ k: source[start:end] for k, source in sources }, i)
+        else:
+            buffer = ring[i % buffers]
+            batch_indexes = indexes[start:end]
+            yield Batch({ k: _take(source, batch_indexes, buffer[k]) for k, source in sources }, i)
+
+def _ring(data, batch_size, buffers):
+    "`buffers` dicts with a preallocated array per source for the batches of `data`"
+    rows = min(batch_size, data._length())
+    return [ { k: np.empty((rows,) + source.shape[1:], dtype=source.dtype) for (k, source) in data._sources.iteritems() } for _ in range(buffers) ]
+
+def _take(source, indexes, buffer):
+    out = buffer[:len(indexes)]
+    # with mode="raise" numpy gathers into a temporary, the indexes are known to be valid
+    np.take(source, indexes, axis=0, out=out, mode="clip")
+    return out
+
+def _map(fn, workers, vectorized, ordered, _iterator):
+    iterator = _iterator()
+
+    try:
+        if not workers:
+            for data in iterator:
+                yield _mapped(data, _apply(fn, vectorized, data.sources))
+        else:
+            for data in _map_pool(fn, workers, vectorized, ordered, iterator):
+                yield data
+    finally:
+        if hasattr(iterator, "close"):
+            iterator.close()
+
+def _map_pool(fn, workers, vectorized, ordered, iterator):
+    first = next(iterator, _DONE)
+
+    if first is _DONE:
+        return
+
+    capacity = max(2 * _layout(first.sources)[1], 1 << 16)
+    slots = [ _Slot(capacity) for _ in range(2 * workers) ]
+    tasks = multiprocessing.Queue()
+    done = multiprocessing.Queue()
+    # the processes are started here and not by a multiprocessing.Pool, which silently replaces workers that die and loses their tasks
+    processes = [ multiprocessing.Process(target=_work_loop, args=(fn, vectorized, slots, tasks, done)) for _ in range(workers) ]
+
+    for process in processes:
+        process.daemon = True
+        process.start()
+
+    free = list(range(len(slots)))
+    pending = [] # (index, data, slot) in the order they were submitted
+    results = {}
+    upcoming = first
+    index = 0
+
+    try:
+        while True:
+            while free and upcoming is not _DONE:
+                slot = free.pop()
+                tasks.put((index, slot, slots[slot].write(upcoming.sources)))
+                pending.append((index, upcoming, slot))
+                upcoming = next(iterator, _DONE)
+                index += 1
+
+            if not pending:
+                break
+
+            while (pending[0][0] not in results) if ordered else not results:
+                i, result = _get(done, lambda: _check_workers(processes))
+                results[i] = result
+
+            position = 0 if ordered else next( p for p, (i, _data, _slot) in enumerate(pending) if i in results )
+            i, data, slot = pending.pop(position)
+            kind, value = results.pop(i)
+
+            if kind == _ERROR:
+                raise value
+
+            outputs = slots[slot].read(value) if kind == _SHARED else value
+            free.append(slot)
+
+            yield _mapped(data, outputs)
+    finally:
+        for process in processes:
+            process.terminate()
+
+        for process in processes:
+            process.join()
+
+        # nobody reads the tasks left in the queue, exiting must not wait for them to be flushed
+        tasks.cancel_join_thread()
+
+def _check_workers(processes):
+    for process in processes:
+        if process.exitcode is not None:
+            raise RuntimeError("a worker of Data.map exited unexpectedly with code {0}".format(process.exitcode))
+
+def _get(queue, check=None):
+    "Waits for an entry of `queue`, `check` is called every time the wait times out and should raise if no entry can ever arrive"
+    # a timeout keeps the wait interruptible
+    while True:
+        try:
+            return queue.get(timeout=0.1)
+        except Queue.Empty:
+            if check is not None:
+                check()
+
+def _apply(fn, vectorized, sources):
+    if vectorized:
+        outputs = fn(sources)
+    else:
+        length = len(next(sources.itervalues()))
+        rows = [ fn({ k: source[i] for (k, source) in sources.iteritems() }) for i in xrange(length) ]
+        outputs = { k: np.stack([ row[k] for row in rows ]) for k in rows[0] } if rows else {}
+
+    return { k: np.asarray(output) for (k, output) in outputs.iteritems() }
+
+def _mapped(data, outputs):
+    new_data = Data(**outputs)
+
+    for name in ("batch", "epoch"):
+        value = getattr(data, name, None)
+
+        if value is not None and not callable(value):
+            setattr(new_data, name, value)
+
+    return new_data
+
+class _Slot(object):
+    "Shared memory for the arrays sent to a worker and the ones it returns, allocated before the pool is forked"
+
+    def __init__(self, capacity):
+        self.input = RawArray("b", capacity)
+        self.output = RawArray("b", capacity)
+
+    def write(self, arrays, output=False):
+        "Returns `(_SHARED, layout)` if `arrays` fit in the buffer, else `(_PICKLED, arrays)`"
+        buffer = self.output if output else self.input
+        layout, size = _layout(arrays)
+
+        if size > len(buffer):
+            return _PICKLED, arrays
+
+        for (k, dtype, shape, offset) in layout:
+            np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)[...] = arrays[k]
+
+        return _SHARED, layout
+
+    def read(self, layout, output=True, copy=True):
+        buffer = self.output if output else self.input
+        return { k: np.array(np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset), copy=copy) for (k, dtype, shape, offset) in layout }
+
+def _layout(arrays):
+    "The `(name, dtype, shape, offset)` of each array in a buffer and the size of the buffer"
+    layout = []
+    size = 0
+
+    for k in sorted(arrays):
+        array = np.asarray(arrays[k])
+        layout.append((k, array.dtype.str, array.shape, size))
+        size += (array.nbytes + 63) // 64 * 64
+
+    return layout, size
+
+# set in the worker processes by _init_worker
+_worker = {}
+
+def _init_worker(fn, vectorized, slots):
+    _worker.update(fn=fn, vectorized=vectorized, slots=slots)
+
+def _work_loop(fn, vectorized, slots, tasks, done):
+    _init_worker(fn, vectorized, slots)
+
+    for index, slot, inputs in iter(tasks.get, None):
+        done.put(_work(index, slot, inputs))
+
+def _work(index, slot, inputs):
+    try:
+        kind, value = inputs
+        slot = _worker["slots"][slot]
+        arrays = slot.read(value, output=False, copy=False) if kind == _SHARED else value
+        outputs = _apply(_worker["fn"], _worker["vectorized"], arrays)
 
-        return sess.run(tensor, feed_dict=feed)
+        return index, slot.write(outputs, output=True)
+    except Exception as e:
+        return index, (_ERROR, _picklable(e, traceback.format_exc()))
 
+def _picklable(e, trace):
+    "Exceptions are sent back to the consumer, the traceback of the worker is kept as `remote_traceback`"
+    try:
+        e.remote_traceback = trace
+        pickle.loads(pickle.dumps(e))
+        return e
+    except Exception:
+        return RuntimeError(trace)
 
-def _window(seq, n=2):
-    "Returns a sliding window (of width n) over data from the iterable"
-    "   s -> (s0,s1,...s[n-1]), (s1,s2,...,sn), ...                   "
-    it = iter(seq)
-    result = tuple(islice(it, n))
-    if len(result) == n:
-        yield result
-    for elem in it:
-        result = result[1:] + (elem,)
-        yield result
+def _random_state(seed):
+    if isinstance(seed, np.random.RandomState):
+        return seed
 
-def _then(q, fn, *args, **kwargs):
-    return query(fn(q, *args, **kwargs))
+    if seed is None:
+        return np.random
 
-asq.queryables.Queryable.then = _then
+    return np.random.RandomState(seed)
 
 if __name__ == '__main__':
     x = np.array(range(1200)).reshape(400, 3)
     y = np.array(range(400)).reshape(400, 1)
 
     d = data(x=x, y=y)
-    [training, validation, test] = d.split(0.6, 0.2, 0.2)
+    [training, validation, test] = d.split(0.6, 0.2, 0.2, seed=0, view=True)
     print([training, validation, test])
 
     for dat in training.batch(4).epochs(10):
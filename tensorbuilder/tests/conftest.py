@@ -0,0 +1,15 @@
+import os
+import pytest
+
+@pytest.fixture(scope="session", autouse=True)
+def cache_dir(tmpdir_factory):
+    "Keeps the manifests built by the tests out of the user's cache"
+    previous = os.environ.get("TENSORBUILDER_CACHE_DIR")
+    os.environ["TENSORBUILDER_CACHE_DIR"] = str(tmpdir_factory.mktemp("tensorbuilder_cache"))
+
+    yield
+
+    if previous is None:
+        del os.environ["TENSORBUILDER_CACHE_DIR"]
+    else:
+        os.environ["TENSORBUILDER_CACHE_DIR"] = previous
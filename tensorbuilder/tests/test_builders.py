@@ -1,3 +1,4 @@
+import json
 import tensorflow as tf
 from tensorbuilder import tb
 
@@ -56,6 +57,48 @@ class TestBuilder(object):
 
         assert "CPU:0" in h1.device
 
+    def test_cse(self):
+        with tb.cse() as cse:
+            a, b, c = tb.pipe(
+                self.x,
+                [
+                    tb.softmax().relu_layer(3)
+                ,
+                    tb.softmax().relu_layer(3)
+                ,
+                    { tf.device("/cpu:0"):
+                        tb.softmax()
+                    }
+                ],
+                tb.tensors()
+            )
+
+        assert a.op.inputs[0].op.inputs[0].op.inputs[0] is b.op.inputs[0].op.inputs[0].op.inputs[0]
+        assert a is not b
+        assert c.op.type == "Softmax" and "CPU:0" in c.device
+        assert cse.report()["deduplicated"] == 1
+        assert cse.report()["functions"] == {"softmax": 1}
+
+        with tb.cse(only=[tf.nn.relu]) as cse:
+            assert tb.build(self.x).softmax().tensor() is not tb.build(self.x).softmax().tensor()
+
+        assert tb.build(self.x).softmax().tensor() is not tb.build(self.x).softmax().tensor()
+
+        # stateful ops like the random mask of dropout are never shared
+        with tb.cse() as cse:
+            a, b = tb.pipe(
+                self.x,
+                [
+                    tb.dropout(0.5)
+                ,
+                    tb.dropout(0.5)
+                ],
+                tb.tensors()
+            )
+
+        assert a is not b
+        assert cse.report()["deduplicated"] == 0
+
 class TestBuilderTree(object):
 
     def test_branches(self):
@@ -70,6 +113,167 @@ class TestBuilderTree(object):
 
         assert a.tensor() == a2.tensor() and b.tensor() == b2.tensor()
 
+    def test_flat_tree(self):
+        a, b, c = tb.build(1), tb.build(2), tb.build(3)
+
+        tree = tb.branches([a, tb.branches([b, [c, a]]), c])
+
+        assert len(tree) == 5
+        assert tree.tensors() == [1, 2, 3, 1, 3]
+        assert tree[3] is a and tree[-1] is c
+
+        first, nested, last = tree.children()
+        assert first is a and last is c
+        assert nested.tensors() == [2, 3, 1]
+        assert [ type(child) for child in nested.children() ] == [ tb.Builder, tb.BuilderTree ]
+
+        mapped = tree.map_each(func)
+        assert mapped.tensors() == [2, 3, 4, 2, 4]
+        assert mapped.children()[1].children()[1].tensors() == [4, 2]
+
+    def test_associative_reduce(self):
+        xs = [ tb.build(tf.placeholder(tf.float32, shape=[4, 5])) for _ in range(8) ]
+        tree = tb.branches(xs)
+
+        assert tree.reduce(tf.add).tensor().op.type == "AddN"
+
+        # unknown dimensions could broadcast at run time, which `tf.add_n` doesn't
+        unknown = tb.branches([ tb.build(tf.placeholder(tf.float32, shape=[None, 5])) for _ in range(4) ])
+        h = unknown.reduce(tf.add).tensor()
+        assert h.op.type == "Add" and [ t.op.type for t in h.op.inputs ] == ["Add", "Add"]
+        assert tree.reduce(tf.add, balanced=False).tensor().op.inputs[1] is xs[-1].tensor()
+
+        h = tree.reduce(tf.maximum).tensor()
+        assert [ t.op.type for t in h.op.inputs ] == ["Maximum", "Maximum"]
+
+        # unregistered functions are folded left unless balanced=True
+        assert tb.branches([ tb.build(i) for i in range(5) ]).reduce(lambda a, b: (a, b)).tensor() == ((((0, 1), 2), 3), 4)
+        assert tb.branches([ tb.build(i) for i in range(5) ]).reduce(lambda a, b: (a, b), balanced=True).tensor() == (((0, 1), (2, 3)), 4)
+
+    def test_fused_fully_connected(self):
+        def _matmuls(fused):
+            graph = tf.Graph()
+
+            with graph.as_default():
+                tree = tb.branches([ tb.build(tf.placeholder(tf.float32, shape=[None, 4])) for _ in range(3) ])
+                h = tree.relu_layer(7, fused=fused).tensor()
+
+            assert h.get_shape().as_list() == [None, 7]
+            assert h.op.type == "Relu"
+
+            return len([ op for op in graph.get_operations() if op.type == "MatMul" ])
+
+        assert _matmuls(True) == 1
+        assert _matmuls(False) == 3
+
+    def test_fused_fully_connected_fallback(self):
+        for shapes in [ [[1, 4], [3, 4]], [[None, 4], [3, 4]] ]:
+            graph = tf.Graph()
+
+            with graph.as_default():
+                tree = tb.branches([ tb.build(tf.placeholder(tf.float32, shape=shape)) for shape in shapes ])
+                h = tree.linear_layer(7).tensor()
+
+            # a layer per leaf, their results are broadcasted by the addition
+            assert len([ op for op in graph.get_operations() if op.type == "MatMul" ]) == 2
+            assert h.get_shape().as_list()[-1] == 7
+
+    def test_slots(self):
+        builder = tb.build(1)
+        tree = builder.branch(lambda x: [x, x])
+
+        for obj in [builder, tree, tb, tb.map(func)]:
+            assert not hasattr(obj, "__dict__")
+
+    def test_profile(self):
+        graph = tf.Graph()
+        relu_layer = tb.Builder.relu_layer
+
+        with graph.as_default():
+            x = tf.placeholder(tf.float32, shape=[None, 5])
+
+            with tb.profile(verbose=False) as profile:
+                h = tb.pipe(
+                    x,
+                    [
+                        tb.relu_layer(4)
+                    ,
+                        tb.sigmoid_layer(4)
+                    ],
+                    tb.reduce(tf.add)
+                    .tensor()
+                )
+
+        stats = { row["name"]: row for row in profile.report() }
+
+        assert stats["Builder.relu_layer"]["calls"] == 1
+        assert stats["Builder.relu_layer"]["ops"] > 0
+        assert stats["BuilderTree.reduce"]["ops"] == 1
+        assert stats["compile"]["calls"] == 1
+        assert stats["compose"]["calls"] >= 3
+        assert json.loads(profile.to_json())["methods"][0]["time"] == profile.report()[0]["time"]
+
+        # methods are restored on exit
+        assert tb.Builder.__dict__["relu_layer"] is relu_layer.__func__
+
+class TestLazyBuilder(object):
+
+    def _ops(self, graph, type):
+        return len([ op for op in graph.get_operations() if op.type == type ])
+
+    def test_dead_branches(self):
+        graph = tf.Graph()
+
+        with graph.as_default():
+            x = tf.placeholder(tf.float32, shape=[None, 5])
+
+        relu, sigmoid = tb.pipe(
+            tb.build(x, lazy=True),
+            [
+                tb.relu_layer(10)
+            ,
+                tb.sigmoid_layer(10)
+            ],
+            tb.builders()
+        )
+
+        assert self._ops(graph, "MatMul") == 0
+
+        h = relu.tensor()
+
+        assert h.graph is graph and h.op.type == "Relu"
+        assert self._ops(graph, "MatMul") == 1
+        assert self._ops(graph, "Sigmoid") == 0
+        assert relu.tensor() is h
+
+    def test_passes(self):
+        graph = tf.Graph()
+
+        with graph.as_default():
+            x = tf.placeholder(tf.float32, shape=[None, 5])
+
+            h = tb.pipe(
+                tb.build(x, lazy=True),
+                [
+                    tb.relu().relu()
+                ,
+                    tb.softmax()
+                ,
+                    { tf.device("/cpu:0"):
+                        tb.tanh()
+                    }
+                ],
+                tb.tanh_layer(4)
+            )
+
+            assert len(graph.get_operations()) == 1
+
+            h = h.tensor()
+
+        assert h.op.type == "Tanh" and h.get_shape().as_list() == [None, 4]
+        assert self._ops(graph, "Relu") == 1
+        assert self._ops(graph, "MatMul") == 1
+        assert [ op.device for op in graph.get_operations() if op.type == "Tanh" and op is not h.op ] == ["/device:CPU:0"]
 
 
 if __name__ == '__main__':
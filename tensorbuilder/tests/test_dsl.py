@@ -1,4 +1,5 @@
 from tensorbuilder import tb
+from tensorbuilder.core import dsl
 import tensorflow as tf
 
 x = tf.placeholder(tf.float32, shape=[None, 5])
@@ -31,4 +32,165 @@ def test_compile():
 
     h = f(x)
 
-    assert "Relu" in h.name
\ No newline at end of file
+    assert "Relu" in h.name
+
+
+def test_deep_pipeline():
+    f = tb
+
+    for _ in range(3000):
+        f = f.map(lambda t: t + 1)
+
+    assert isinstance(f.f, dsl.Program)
+    assert len(f.f) == 3000
+    assert tb.pipe(tb.build(0), f, tb.tensor()) == 3000
+    assert tb.pipe(tb.build(0), tuple([ tb.map(lambda t: t * 2) ] * 3000), tb.tensor()) == 0
+
+def test_scope_exits_on_error():
+    graph = tf.Graph()
+
+    def _fail(builder):
+        raise ValueError("fail")
+
+    try:
+        tb.pipe(tb.build(0), { graph.as_default(): _fail })
+    except ValueError:
+        pass
+
+    assert tf.get_default_graph() is not graph
+
+def test_compile_cache():
+    tb.compile_cache_clear()
+    layer = tb.map(lambda t: t + 1)
+    branches = [ layer, layer ]
+    tensors = tb.tensors()
+
+    for _ in range(3):
+        assert tb.pipe(tb.build(0), layer, branches, tensors) == [2, 2]
+
+    info = tb.compile_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (2, 1, 1)
+
+    branches.append(layer)
+
+    assert tb.pipe(tb.build(0), layer, branches, tensors) == [2, 2, 2]
+    assert tb.compile_cache_info().misses == 2
+
+def test_compile_cache_generators():
+    graph = tf.Graph()
+
+    with graph.as_default():
+        x = tf.placeholder(tf.float32, shape=[None, 5])
+        h = tb.pipe(x, (tb.relu_layer(n) for n in [7, 3]), tb.tensor())
+
+    assert h.get_shape().as_list() == [None, 3]
+
+def test_incremental_pipe():
+    graph = tf.Graph()
+
+    with graph.as_default():
+        x = tf.placeholder(tf.float32, shape=[None, 5])
+
+        def _trial(*tail):
+            return tb.pipe(x, tb.relu_layer(8), [tb.sigmoid_layer(4), tb.tanh_layer(4)], tb.reduce(tf.add), *tail, incremental=True)
+
+        a = _trial(tb.softmax_layer(3), tb.tensor())
+        ops = len(graph.get_operations())
+
+        b = _trial(tb.softmax_layer(3), tb.tensor())
+        assert b is a
+        assert len(graph.get_operations()) == ops
+
+        c = _trial(tb.relu_layer(2), tb.tensor())
+        assert c.op.inputs[0].op.inputs[0].op.inputs[0] is a.op.inputs[0].op.inputs[0].op.inputs[0]
+        assert len([ op for op in graph.get_operations() if op.type == "MatMul" ]) == 5
+
+def test_estimate():
+    estimate = tb.estimate((tb.relu_layer(100), tb.softmax_layer(10)), [None, 784])
+
+    assert estimate.params == 784 * 100 + 100 + 100 * 10 + 10
+    assert estimate.flops == 784 * 100 + 100 * 10
+    assert estimate.output_shape == (None, 10)
+    assert estimate.unknown == []
+
+    estimate = tb.estimate(
+        (
+            tb.convolution2d(32, [3, 3])
+            .max_pool_2d(2)
+            .flatten()
+            .dropout(0.5),
+            [tb.relu_layer(10), tb.tanh_layer(20)],
+            tb.sigmoid_layer(5)
+        ),
+        [None, 28, 28, 1]
+    )
+
+    assert estimate.output_shape == (None, 5)
+    assert [ node["shape"] for node in estimate.nodes[:3] ] == [(None, 28, 28, 32), (None, 14, 14, 32), (None, 6272)]
+    assert estimate.params == (9 * 32 + 32) + (6272 * 10 + 10) + (6272 * 20 + 20) + (30 * 5 + 5)
+    assert estimate.activation_bytes == 4 * (28 * 28 * 32 + 14 * 14 * 32 + 6272 + 6272 + 30 + 5)
+
+def test_estimate_tree_fully_connected():
+    for fused in [True, False]:
+        ast = ([tb.relu_layer(4), tb.tanh_layer(6)], tb.linear_layer(7, fused=fused))
+        graph = tf.Graph()
+
+        with graph.as_default():
+            x = tf.placeholder(tf.float32, shape=[None, 5])
+            tb.pipe(x, ast)
+            params = sum( v.get_shape().num_elements() for v in tf.trainable_variables() )
+
+        estimate = tb.estimate(ast, [None, 5])
+
+        assert estimate.params == params
+        assert estimate.params == (5 * 4 + 4) + (5 * 6 + 6) + ((10 * 7 + 7) if fused else (4 * 7 + 7) + (6 * 7 + 7))
+
+def test_name_scopes():
+    graph = tf.Graph()
+
+    with graph.as_default():
+        x = tf.placeholder(tf.float32, shape=[None, 5])
+
+        h = tb.pipe(
+            x,
+            tb.relu_layer(8),
+            [
+                tb.sigmoid_layer(4)
+            ,
+                { tf.device("/cpu:0"):
+                    tb.tanh_layer(4)
+                }
+            ],
+            tb.reduce(tf.add).tensor(),
+            name_scopes=True
+        )
+
+        names = [ op.name for op in graph.get_operations() ]
+
+    assert any( name.startswith("step_0/relu_layer/") for name in names )
+    assert any( name.startswith("step_1/branch_0/sigmoid_layer/") for name in names )
+    assert any( name.startswith("step_1/branch_1/scope/tanh_layer/") for name in names )
+    assert h.name.startswith("step_2/reduce/")
+
+    layer = tb.relu_layer(8)
+    assert tb.compile(layer, name_scopes=True) is tb.compile(layer, name_scopes=True)
+    assert tb.compile(layer) is not tb.compile(layer, name_scopes=True)
+
+def test_incremental_name_scopes():
+    graph = tf.Graph()
+
+    with graph.as_default():
+        x = tf.placeholder(tf.float32, shape=[None, 5])
+
+        def _trial(*tail):
+            return tb.pipe(x, tb.relu_layer(8), [tb.sigmoid_layer(4), tb.tanh_layer(4)], tb.reduce(tf.add), *tail, incremental=True, name_scopes=True)
+
+        a = _trial(tb.softmax_layer(3), tb.tensor())
+        ops = len(graph.get_operations())
+
+        assert _trial(tb.softmax_layer(3), tb.tensor()) is a
+        assert len(graph.get_operations()) == ops
+
+        b = _trial(tb.relu_layer(2), tb.tensor())
+        assert b.op.inputs[0].op.inputs[0].op.inputs[0] is a.op.inputs[0].op.inputs[0].op.inputs[0]
+        assert len([ op for op in graph.get_operations() if op.type == "MatMul" ]) == 5
@@ -0,0 +1,192 @@
+import inspect
+import numpy as np
+import tensorflow as tf
+from tensorbuilder import tb, extensions
+from tensorbuilder.core import utils
+from tensorbuilder.extensions import manifest
+from tensorbuilder.extensions.patches import tensorbuilder_patch
+
+class TestLazyPatch(object):
+    """docstring for TestLazyPatch"""
+
+    x = tf.placeholder(tf.float32, shape=[None, 5])
+
+    def test_lazy_method_is_cached(self):
+        Builder, BuilderTree, Applicative = extensions.patched_tensorbuilder_classes(eager=False)
+
+        assert "softmax_layer" not in Builder.__dict__
+
+        h = Builder(self.x).softmax_layer(3).tensor()
+
+        assert "softmax_layer" in Builder.__dict__
+        assert "fully_connected" in Builder.__dict__
+        assert "Softmax" in h.name
+
+    def test_lazy_applicative(self):
+        Builder, BuilderTree, Applicative = extensions.patched_tensorbuilder_classes(eager=False)
+        app = Applicative(lambda x: x)
+
+        h = app.relu_layer(4).tensor()(Builder(self.x))
+
+        assert "relu_layer" in Applicative.__dict__
+        assert "Relu" in h.name
+
+    def test_lazy_unknown_method(self, tmpdir, monkeypatch):
+        monkeypatch.setenv("TENSORBUILDER_CACHE_DIR", str(tmpdir))
+        monkeypatch.setattr(tensorbuilder_patch, "_tf_aliases_by_name", None)
+        Builder, BuilderTree, Applicative = extensions.patched_tensorbuilder_classes(eager=False)
+
+        assert not hasattr(Builder, "not_a_tensorflow_function")
+        assert not hasattr(Builder(self.x), "not_a_tensorflow_function_layer")
+
+        # a lookup never builds the manifest
+        assert tmpdir.listdir() == []
+
+    def test_eager_and_lazy_docs(self, tmpdir, monkeypatch):
+        monkeypatch.setenv("TENSORBUILDER_CACHE_DIR", str(tmpdir))
+        eager = extensions.patched_tensorbuilder_classes(eager=True)
+        lazy = extensions.patched_tensorbuilder_classes(eager=False)
+
+        for name in ["softmax", "tanh_layer", "with_device", "flatten"]:
+            assert getattr(eager[0], name).__doc__ == getattr(lazy[0], name).__doc__
+
+    def test_eager_and_lazy_methods(self, tmpdir, monkeypatch):
+        monkeypatch.setenv("TENSORBUILDER_CACHE_DIR", str(tmpdir))
+        monkeypatch.setattr(tensorbuilder_patch, "_tf_aliases_by_name", None)
+        # the aliases are only resolved lazily with a cached manifest
+        _path, entries = extensions.rebuild_manifest()
+
+        eager = extensions.patched_tensorbuilder_classes(eager=True, use_manifest=False)
+        lazy = extensions.patched_tensorbuilder_classes(eager=False)
+        attributes = [ name for module in [tf, tf.nn] for name in dir(module) if not name.startswith("_") ]
+
+        for eager_cls, lazy_cls in [(eager[0], lazy[0]), (eager[2], lazy[2])]:
+            names = set( name for name in utils.get_method_names(eager_cls) if not name.startswith("_") )
+            candidates = names | set(attributes) | set( name + "_layer" for name in attributes )
+
+            assert set( name for name in candidates if inspect.ismethod(getattr(lazy_cls, name, None)) ) == names
+
+        # map methods named after `f.__name__` instead of the attribute, e.g. `neg` for `tf.negative`
+        aliases = [ entry for entry in entries if entry["class"] == "Builder" and entry["kind"] == "map" and entry["library"] in ("tf", "tf.nn") and entry["name"] != entry["source"] ]
+        names = set(utils.get_method_names(eager[0]))
+
+        # private names like `_floor_div` can't be looked up lazily so they aren't registered eagerly either
+        assert not [ entry for entry in entries if entry["name"].startswith("_") ]
+
+        for entry in aliases:
+            assert hasattr(lazy[0], entry["name"])
+            assert hasattr(lazy[0], entry["source"]) == (entry["source"] in names)
+
+    def test_lazy_docs(self):
+        Builder, BuilderTree, Applicative = extensions.patched_tensorbuilder_classes(eager=False)
+
+        def _fn(tensor):
+            "docs of _fn"
+            return tensor
+
+        Builder.register_map_method(_fn, "my.lib", alias="identity_map")
+
+        assert isinstance(Builder.__dict__["identity_map"], utils.LazyDocMethod)
+
+        doc = Builder.identity_map.__doc__
+
+        assert "my.lib._fn" in doc and "docs of _fn" in doc
+        assert not isinstance(Builder.__dict__["identity_map"], utils.LazyDocMethod)
+
+    def test_profile_lazy_docs(self):
+        Builder, BuilderTree, Applicative = extensions.patched_tensorbuilder_classes(eager=False)
+
+        def _fn(tensor):
+            "docs of _fn"
+            return tensor
+
+        Builder.register_map_method(_fn, "my.lib", alias="identity_map")
+        Builder.register_map_method(_fn, "my.lib", alias="identity_map")
+        method = Builder.__dict__["identity_map"]
+
+        assert utils.generated_methods[Builder] >= set(["identity_map"])
+
+        with tb.profile(verbose=False) as profile:
+            assert isinstance(Builder.__dict__["identity_map"], utils.LazyDocMethod)
+            Builder(self.x).identity_map()
+
+        # the documentation wasn't rendered and the original descriptor is back
+        assert Builder.__dict__["identity_map"] is method and method.doc is not None
+        assert "Builder.identity_map" in [ row["name"] for row in profile.report() ]
+        assert "docs of _fn" in Builder.identity_map.__doc__
+
+class TestManifest(object):
+
+    def test_manifest_roundtrip(self, tmpdir, monkeypatch):
+        monkeypatch.setenv("TENSORBUILDER_CACHE_DIR", str(tmpdir))
+
+        assert manifest.load() is None
+
+        path, entries = extensions.rebuild_manifest()
+
+        assert path.startswith(str(tmpdir))
+        assert manifest.load() == entries
+        assert { "class": "Builder", "name": "softmax_layer", "kind": "layer", "module": "tensorflow.nn", "source": "softmax", "library": "tf.nn" } in entries
+
+        Builder, BuilderTree, Applicative = extensions.patched_tensorbuilder_classes(eager=True, use_manifest=True)
+
+        assert "softmax_layer" in Builder.__dict__
+        assert "softmax_layer" in Applicative.__dict__
+
+    def test_manifest_not_writable(self, tmpdir, monkeypatch):
+        monkeypatch.setenv("TENSORBUILDER_CACHE_DIR", str(tmpdir))
+
+        def _save(entries):
+            raise IOError("read-only")
+
+        monkeypatch.setattr(manifest, "save", _save)
+
+        entries = extensions.load_manifest()
+
+        assert entries and entries == extensions.build_manifest()
+
+    def test_manifest_versions(self, tmpdir, monkeypatch):
+        monkeypatch.setenv("TENSORBUILDER_CACHE_DIR", str(tmpdir))
+        extensions.rebuild_manifest()
+
+        versions = dict(manifest.versions(), tensorflow="0.0.0")
+        monkeypatch.setattr(manifest, "versions", lambda: versions)
+
+        assert manifest.load() is None
+
+class TestPolynomic(object):
+
+    @staticmethod
+    def _per_column(tensor):
+        "The original implementation, one `tf.pow` per column"
+        pack = getattr(tf, "stack", None) or tf.pack
+        pows = [ tf.pow(tensor[:, n], n + 1) for n in range(int(tensor.get_shape()[1])) ]
+        return tf.transpose(pack(pows))
+
+    def test_polynomic(self):
+        graph = tf.Graph()
+
+        with graph.as_default():
+            x = tf.placeholder(tf.float32, shape=[None, 64])
+
+            n = len(graph.get_operations())
+            h_per_column = self._per_column(x)
+            per_column_ops = len(graph.get_operations()) - n
+
+            n = len(graph.get_operations())
+            h = tb.build(x).polynomic().tensor()
+            ops = len(graph.get_operations()) - n
+
+            h_degree = tb.build(x).polynomic(degree=3).tensor()
+
+        assert ops < per_column_ops
+
+        values = np.random.uniform(-1, 1, size=(256, 64)).astype(np.float32)
+        feed = {x: values}
+
+        with tf.Session(graph=graph) as sess:
+            expected, result, result_degree = sess.run([h_per_column, h, h_degree], feed_dict=feed)
+
+        assert np.allclose(expected, result)
+        assert result_degree.shape == (256, 64 * 3)
+        assert np.allclose(result_degree[:, :3], values[:, :1] ** np.arange(1, 4))
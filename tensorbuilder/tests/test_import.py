@@ -0,0 +1,45 @@
+import os
+import sys
+import subprocess
+import tensorbuilder
+
+# seconds that importing tensorbuilder may add on top of importing tensorflow
+BUDGET = float(os.environ.get("TENSORBUILDER_IMPORT_BUDGET", "0.5"))
+
+# import the same tensorbuilder that is being tested
+_cwd = os.path.dirname(os.path.dirname(os.path.abspath(tensorbuilder.__file__)))
+
+_code = """
+import sys, time
+import tensorflow
+start = time.time()
+{0}
+print(time.time() - start)
+print("tflearn" in sys.modules)
+print("asq" in sys.modules)
+"""
+
+def _import(statement):
+    "Imports in a fresh interpreter, returns the best time of 3 runs and the heavy modules that got imported"
+    runs = []
+
+    for _ in range(3):
+        output = subprocess.check_output([sys.executable, "-c", _code.format(statement)], cwd=_cwd)
+        seconds, tflearn, asq = output.strip().splitlines()[-3:]
+        runs.append((float(seconds), tflearn == "True", asq == "True"))
+
+    return min(runs)
+
+def test_import_tensorbuilder():
+    seconds, tflearn, asq = _import("import tensorbuilder")
+
+    assert not tflearn
+    assert not asq
+    assert seconds < BUDGET
+
+def test_import_tb():
+    seconds, tflearn, asq = _import("from tensorbuilder import tb")
+
+    assert not tflearn
+    assert not asq
+    assert seconds < BUDGET
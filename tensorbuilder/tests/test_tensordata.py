@@ -0,0 +1,173 @@
+import os
+import pytest
+import signal
+import threading
+import multiprocessing
+import numpy as np
+from tensorbuilder import tb
+from tensorbuilder import tensordata
+from tensorbuilder.tensordata import Batch
+
+def _data(rows=100):
+    x = np.arange(rows * 3, dtype=np.float32).reshape(rows, 3)
+    y = np.arange(rows, dtype=np.float32).reshape(rows, 1)
+    return tb.data(x=x, y=y)
+
+def test_split():
+    data = _data()
+    training, validation, test = data.split(0.6, 0.2, 0.2, seed=1)
+
+    assert [ len(part.x) for part in [training, validation, test] ] == [60, 20, 20]
+    assert sorted(np.concatenate([training.y, validation.y, test.y])[:, 0]) == list(range(100))
+    assert (training.x[:, 0] == training.y[:, 0] * 3).all()
+    assert (data.split(0.5, 0.5, seed=1)[0].x == data.split(0.5, 0.5, seed=np.random.RandomState(1))[0].x).all()
+
+def test_split_view():
+    data = _data()
+    training, test = data.split(0.8, 0.2, seed=1, view=True)
+
+    assert training.sources is not data.sources
+    assert training._sources["x"] is data.x
+    assert len(training.indexes) == 80 and len(test.indexes) == 20
+    assert (training.x == data.split(0.8, 0.2, seed=1)[0].x).all()
+
+    # parts of views are views of the original sources
+    a, b = training.split(0.5, 0.5, seed=2, view=True)
+    assert a._sources["x"] is data.x
+    assert sorted(np.concatenate([a.indexes, b.indexes])) == sorted(training.indexes)
+
+    batches = list(training.batch(32))
+
+    assert [ len(batch.x) for batch in batches ] == [32, 32, 16]
+    assert (np.concatenate([ batch.y for batch in batches ]) == training.y).all()
+    assert (batches[0].x[:, 0] == batches[0].y[:, 0] * 3).all()
+
+def test_shuffle():
+    data = _data()
+    epochs = {}
+
+    for batch in data.shuffle(seed=3).batch(30).epochs(2):
+        assert (batch.x[:, 0] == batch.y[:, 0] * 3).all()
+        epochs.setdefault(batch.epoch, []).append(batch.y[:, 0].copy())
+
+    first, second = [ np.concatenate(epochs[epoch]) for epoch in [0, 1] ]
+
+    assert sorted(first) == sorted(second) == list(range(100))
+    assert (first != second).any()
+    assert (first == np.concatenate([ batch.y[:, 0] for batch in data.shuffle(seed=3).batch(30) ])).all()
+
+def test_batch_reuse():
+    data = _data()
+    batches = data.shuffle(seed=3).batch(30, reuse=True).epochs(2)
+    buffers = set()
+    rows = []
+
+    for batch in batches:
+        buffers.add(batch.x.__array_interface__["data"][0])
+        rows.append(batch.y[:, 0].copy())
+        assert (batch.x[:, 0] == batch.y[:, 0] * 3).all()
+
+    assert len(buffers) <= 2 # one buffer per pass
+    assert sorted(np.concatenate(rows[:4])) == list(range(100))
+
+def test_batch_ring():
+    data = _data()
+    batches = list(data.shuffle(seed=3).batch(10, reuse=True, buffers=3))
+
+    assert all( type(batch) is Batch for batch in batches )
+    assert not hasattr(batches[0], "__dict__")
+    assert [ batch.batch for batch in batches ] == list(range(10))
+
+    # the ring is reused every 3 batches, the last 3 batches are still valid
+    assert batches[0].x is not batches[1].x and np.may_share_memory(batches[0].x, batches[3].x)
+    assert sorted(np.concatenate([ batch.y[:, 0] for batch in batches[-3:] ])) == sorted(np.concatenate([ batch.y for batch in data.shuffle(seed=3).batch(10) ][-3:])[:, 0])
+
+    kept = batches[-1].copy()
+    assert not np.may_share_memory(kept.x, batches[-1].x) and kept.batch == 9
+
+    # batches of sources that are not views are slices
+    batch = next(iter(data.batch(10, reuse=True)))
+    assert np.may_share_memory(batch.x, data.x) and (batch.y[:, 0] == list(range(10))).all()
+
+def test_prefetch():
+    data = _data()
+    expected = [ batch.y[:, 0].tolist() for batch in data.batch(10).epochs(2) ]
+    prefetched = data.batch(10).epochs(2).prefetch(3)
+
+    assert [ batch.y[:, 0].tolist() for batch in prefetched ] == expected
+    assert prefetched.prefetch_stats.consumed == 20
+
+    # the stats are kept by the Data created after the prefetch
+    mapped = prefetched.map(lambda sources: sources)
+    assert mapped.prefetch_stats is prefetched.prefetch_stats
+    assert len(list(mapped)) == 20
+    assert mapped.prefetch_stats.consumed == 40
+    assert data.prefetch_stats is None
+
+    # stopping early stops the producer
+    threads = threading.active_count()
+
+    for i, batch in enumerate(data.batch(1).prefetch(2)):
+        if i == 5:
+            break
+
+    assert threading.active_count() == threads
+
+    # errors of the producer are raised by the consumer
+    def _fail():
+        yield data
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        list(tb.data(_iterator=_fail, **data.sources).prefetch(1))
+
+def test_prefetch_dead_producer(monkeypatch):
+    # a producer that exits without putting anything, e.g. killed outside its try
+    monkeypatch.setattr(tensordata, "_produce", lambda *args: None)
+
+    with pytest.raises(RuntimeError):
+        list(_data().batch(10).prefetch(2))
+
+def test_map():
+    data = _data()
+    double = lambda sources: dict(sources, x=sources["x"] * 2)
+    expected = [ (batch.batch, batch.epoch, batch.x * 2, batch.y) for batch in data.batch(16).epochs(2) ]
+
+    for workers in [None, 2]:
+        mapped = list(data.batch(16).epochs(2).map(double, workers=workers))
+
+        assert [ batch.batch for batch in mapped ] == [ batch for batch, _, _, _ in expected ]
+        assert [ batch.epoch for batch in mapped ] == [ epoch for _, epoch, _, _ in expected ]
+        assert all( (batch.x == x).all() and (batch.y == y).all() for batch, (_, _, x, y) in zip(mapped, expected) )
+
+    unordered = data.batch(16).map(double, workers=2, ordered=False)
+    assert sorted( batch.y[0, 0] for batch in unordered ) == list(range(0, 100, 16))
+
+    rows = list(data.batch(50).map(lambda row: dict(s=row["x"].sum(keepdims=True)), workers=2, vectorized=False))
+    assert (np.concatenate([ batch.s for batch in rows ])[:, 0] == data.x.sum(axis=1)).all()
+
+def test_map_errors_and_early_stop():
+    data = _data()
+
+    def _fail(sources):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        list(data.batch(10).map(_fail, workers=2))
+
+    for i, batch in enumerate(data.batch(1).map(lambda sources: sources, workers=2)):
+        if i == 3:
+            break
+
+    assert multiprocessing.active_children() == []
+
+def test_map_killed_worker():
+    data = _data()
+
+    def _kill(sources):
+        os.kill(os.getpid(), signal.SIGKILL)
+
+    with pytest.raises(RuntimeError):
+        list(data.batch(10).map(_kill, workers=2))
+
+    assert multiprocessing.active_children() == []